@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import numpy as np
+import triangle
+from constants import *
+from mesher import Mesher
+from mesh_writer import MeshWriter, ElementNaming, parse_element_coords
+from pslg import read_border_file, read_pillar_file, split_polygons, build_pslg
+from spatial_index import PolygonIndex
+from image_source import ImageSource
+from image_analysis import ImageAnalyzer
+from Benchmarks.synthetic_layout import make_layout, write_layout, render_layout
+
+# End-to-end benchmark of every meshing stage on synthetic room-and-pillar layouts
+# Run from the repository root: python -m Benchmarks.mesh_benchmark --output report.json
+# Compare two reports with: python -m Benchmarks.mesh_benchmark --compare old.json new.json
+
+PILLAR_COUNTS = [10, 100, 1000, 10000]
+MAX_AREA = 2.0
+PIXELS_PER_UNIT = 4
+REPORT_VERSION = 1
+NAMING = ELEMENT_NAMING_WIDE  # Legacy names stop at 99 pillars
+
+def timed(stages, name, func, *args):
+    """Calls func(*args), records its wall time in stages[name] and returns its result."""
+    start = time.perf_counter()
+    result = func(*args)
+    stages[name] = time.perf_counter() - start
+    return result
+
+def benchmark_mesh(project_dir, max_area, plot, naming=NAMING):
+    """Times every mesh stage of the project in project_dir. Returns (stage times, counts)."""
+    stages = {}
+    data_dir = os.path.join(project_dir, DATA_FOLDER_NAME)
+    mesher = Mesher(project_dir, use_cache=False)
+
+    def parse():
+        border = read_border_file(os.path.join(data_dir, BORDER_VERTEX_FILE_NAME))
+        return border, read_pillar_file(os.path.join(data_dir, PILLAR_VERTEX_FILE_NAME))
+
+    border, (pillar_coords, pillar_offsets) = timed(stages, "parse", parse)
+    holes = split_polygons(pillar_coords, pillar_offsets)
+    polygon = timed(stages, "pslg", build_pslg, border, pillar_coords, pillar_offsets)
+    mesh = timed(stages, "triangulate", triangle.triangulate, polygon, f"pqa{max_area}")
+    mesh = timed(stages, "enforce_edge_constraint", mesher.enforce_edge_constraint, mesh, MAX_EDGES_PER_VERTEX)
+    index = timed(stages, "spatial_index", PolygonIndex, holes)
+    region_ids = timed(stages, "classify", mesher.classify_triangles, mesh, holes, index)
+
+    mesh_dir = os.path.join(data_dir, MESH_FOLDER_NAME)
+    writer = MeshWriter(mesh_dir, os.path.join(data_dir, PLOT_FOLDER_NAME), naming=ElementNaming(naming))
+    writer.prepare_folders()
+    timed(stages, "write", writer.write, mesh['vertices'], mesh['triangles'], region_ids, len(holes))
+    timed(stages, "write_sidecars", writer.write_sidecars, mesh['vertices'], mesh['triangles'], region_ids, len(holes))
+
+    counts = {
+        'pillars': len(holes),
+        'vertices': len(mesh['vertices']),
+        'triangles': len(mesh['triangles']),
+    }
+    if not plot:
+        return stages, counts
+
+    # Imported here as the plot dialog pulls in matplotlib, drawn off screen
+    from Dialogs.plotDialog import Plotter, MeshView
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+
+    element_files = [os.path.join(mesh_dir, name) for name in sorted(os.listdir(mesh_dir)) if name.endswith(f".{ELEMENT_FILE_EXT}")]
+    timed(stages, "read_text", lambda: [parse_element_coords(path) for path in element_files])
+    plotter = Plotter(mesh_dir)
+    mesh_data = timed(stages, "read_plot", plotter.read_mesh_data)
+
+    def draw():
+        figure = plt.figure(figsize=(10, 8))
+        view = MeshView(figure.gca(), [(data, color) for data, color in mesh_data if len(data["triangles"])])
+        figure.canvas.draw()
+        plt.close(figure)
+        return view
+
+    timed(stages, "plot", draw)
+    return stages, counts
+
+def benchmark_image(image_path):
+    """Times polygon detection on a rendered layout image, the way the GUI runs it."""
+    stages = {}
+    analyzer = ImageAnalyzer(ImageSource(image_path))
+    timed(stages, "decode", analyzer.source.gray)
+    timed(stages, "contours", analyzer.contours)
+    polygons = timed(stages, "find_polygons", analyzer.polygons, 0.01, 0)
+    timed(stages, "find_polygons_filtered", analyzer.polygons, 0.005, 2)
+    timed(stages, "preview", analyzer.display_image, 1280, 720)
+    return stages, len(polygons)
+
+def run(pillar_counts, max_area, plot=True, images=True, keep_dir=None, naming=NAMING):
+    """Benchmarks every layout size and returns the report as a dict."""
+    report = {
+        'version': REPORT_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'max_area': max_area,
+        'naming': naming,
+        'results': [],
+    }
+
+    for count in pillar_counts:
+        project_dir = tempfile.mkdtemp(prefix=f"layout{count}_", dir=keep_dir)
+        try:
+            border, pillars = make_layout(count)
+            write_layout(project_dir, border, pillars)
+            stages, counts = benchmark_mesh(project_dir, max_area, plot, naming)
+
+            result = {**counts, 'stages': stages}
+            if images:
+                image_path = os.path.join(project_dir, "pillars.png")
+                result['image_size'] = list(render_layout(image_path, border, pillars, PIXELS_PER_UNIT))
+                result['image_stages'], result['polygons_found'] = benchmark_image(image_path)
+            report['results'].append(result)
+            print_result(result)
+        finally:
+            if keep_dir is None:
+                shutil.rmtree(project_dir, ignore_errors=True)
+    return report
+
+def print_result(result):
+    stages = {**result['stages'], **result.get('image_stages', {})}
+    print(f"{result['pillars']} pillars, {result['triangles']} triangles")
+    for name, seconds in stages.items():
+        print(f"  {name:<24} {seconds:>9.3f} s")
+
+def compare(old_path, new_path):
+    """Prints the stage times of two reports side by side for the layout sizes both contain."""
+    with open(old_path) as f:
+        old = {result['pillars']: result for result in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {result['pillars']: result for result in json.load(f)['results']}
+
+    print(f"{'pillars':>8} {'stage':<24} {'old (s)':>9} {'new (s)':>9} {'ratio':>7}")
+    for count in sorted(set(old) & set(new)):
+        old_stages = {**old[count]['stages'], **old[count].get('image_stages', {})}
+        new_stages = {**new[count]['stages'], **new[count].get('image_stages', {})}
+        for name in old_stages:
+            if name in new_stages:
+                ratio = new_stages[name] / old_stages[name] if old_stages[name] > 0 else float("nan")
+                print(f"{count:>8} {name:<24} {old_stages[name]:>9.3f} {new_stages[name]:>9.3f} {ratio:>7.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every meshing stage on synthetic room-and-pillar layouts.")
+    parser.add_argument("--pillars", type=int, nargs="+", default=PILLAR_COUNTS, help="layout sizes to benchmark, in pillars")
+    parser.add_argument("--max-area", type=float, default=MAX_AREA, help="maximum triangle area (pillars are about 6 x 6)")
+    parser.add_argument("--naming", choices=ELEMENT_NAMINGS, default=NAMING, help="element naming scheme of the written files")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--no-plot", action="store_true", help="skip reading the mesh back and plotting it")
+    parser.add_argument("--no-images", action="store_true", help="skip polygon detection on rendered images")
+    parser.add_argument("--keep", metavar="DIR", help="keep the generated projects in this folder")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = run(args.pillars, args.max_area, plot=not args.no_plot, images=not args.no_images, keep_dir=args.keep, naming=args.naming)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
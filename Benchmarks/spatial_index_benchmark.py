@@ -0,0 +1,56 @@
+import time
+import numpy as np
+from classification import classify_points, points_in_polygon
+from spatial_index import PolygonIndex
+
+# Benchmark for PolygonIndex lookups as the number of pillars grows
+# Run from the repository root: python -m Benchmarks.spatial_index_benchmark
+
+PILLAR_COUNTS = [10, 100, 1000, 10000]
+POINTS_PER_PILLAR = 200
+BRUTE_FORCE_LIMIT = 1000
+
+def make_pillars(count, rng):
+    """Returns count irregular octagons laid out on a square grid."""
+    side = int(np.ceil(np.sqrt(count)))
+    angles = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+    pillars = []
+    for k in range(count):
+        centre = np.array([k % side, k // side]) * 10.0 + 5.0
+        radii = rng.uniform(2.0, 4.0, len(angles))
+        pillars.append(centre + np.column_stack([np.cos(angles), np.sin(angles)]) * radii[:, None])
+    return pillars, side * 10.0
+
+def brute_force(points, pillars):
+    region_ids = np.zeros(len(points), dtype=np.int64)
+    for j, pillar in enumerate(pillars):
+        unassigned = region_ids == 0
+        region_ids[np.flatnonzero(unassigned)[points_in_polygon(points[unassigned], pillar)]] = j + 1
+    return region_ids
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'pillars':>8} {'points':>9} {'build (s)':>10} {'lookup (s)':>11} {'pairs/pt':>9} {'classify (s)':>13} {'brute (s)':>10}")
+    for count in PILLAR_COUNTS:
+        pillars, size = make_pillars(count, rng)
+        points = rng.uniform(0, size, (count * POINTS_PER_PILLAR, 2))
+
+        index, build_time = timed(PolygonIndex, pillars)
+        (point_ids, _), lookup_time = timed(index.candidates, points)
+        region_ids, classify_time = timed(classify_points, points, pillars, index)
+
+        brute = "-"
+        if count <= BRUTE_FORCE_LIMIT:
+            expected, brute_time = timed(brute_force, points, pillars)
+            assert np.array_equal(region_ids, expected)
+            brute = f"{brute_time:.3f}"
+
+        print(f"{count:>8} {len(points):>9} {build_time:>10.3f} {lookup_time:>11.3f} {len(point_ids) / len(points):>9.2f} {classify_time:>13.3f} {brute:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import cv2
+from constants import *
+
+# Synthetic room-and-pillar layouts for the benchmarks: a grid of irregular pillars
+# separated by rooms, inside a border with a jagged outline.
+
+PILLAR_SPACING = 10.0  # Distance between pillar centres, in grid units
+PILLAR_HALF_WIDTH = 3.0  # Half the side of a pillar before it is distorted
+BORDER_MARGIN = 6.0  # Room between the outermost pillars and the border
+BORDER_POINTS_PER_SIDE = 40
+
+def make_pillar(centre, rng):
+    """Returns an irregular pillar: a square with jittered corners and extra vertices pushed in or out along its sides."""
+    h = PILLAR_HALF_WIDTH
+    corners = np.array([[-h, -h], [h, -h], [h, h], [-h, h]]) + rng.uniform(-0.6, 0.6, (4, 2))
+    outline = []
+    for k in range(4):
+        start, end = corners[k], corners[(k + 1) % 4]
+        outline.append(start)
+        normal = np.array([end[1] - start[1], start[0] - end[0]]) / np.linalg.norm(end - start)
+        for t in np.sort(rng.uniform(0.2, 0.8, rng.integers(0, 3))):
+            outline.append(start + t * (end - start) + normal * rng.uniform(-0.5, 0.5))
+    return centre + np.array(outline)
+
+def make_layout(num_pillars, seed=0):
+    """Returns (border, pillars) of a layout with num_pillars pillars, in grid units.
+
+    The pillars fill a square grid row by row. The border is the rectangle around them,
+    with its points moved outwards at random so it never touches a pillar.
+    """
+    rng = np.random.default_rng(seed)
+    columns = int(np.ceil(np.sqrt(num_pillars)))
+    rows = int(np.ceil(num_pillars / columns))
+    pillars = [make_pillar(np.array([k % columns + 0.5, k // columns + 0.5]) * PILLAR_SPACING + BORDER_MARGIN, rng) for k in range(num_pillars)]
+
+    width = columns * PILLAR_SPACING + 2 * BORDER_MARGIN
+    height = rows * PILLAR_SPACING + 2 * BORDER_MARGIN
+    t = np.linspace(0, 1, BORDER_POINTS_PER_SIDE, endpoint=False)
+    sides = [
+        (np.column_stack([t * width, np.zeros_like(t)]), [0, -1]),
+        (np.column_stack([np.full_like(t, width), t * height]), [1, 0]),
+        (np.column_stack([(1 - t) * width, np.full_like(t, height)]), [0, 1]),
+        (np.column_stack([np.zeros_like(t), (1 - t) * height]), [-1, 0]),
+    ]
+    border = np.vstack([points + np.outer(rng.uniform(0, BORDER_MARGIN / 2, len(points)), direction) for points, direction in sides])
+    return border, pillars
+
+def write_layout(project_dir, border, pillars):
+    """Writes border.dat and pillars.dat into project_dir/Data in the format the GUI saves."""
+    data_dir = os.path.join(project_dir, DATA_FOLDER_NAME)
+    os.makedirs(data_dir, exist_ok=True)
+    for filename, polygons, start in ((BORDER_VERTEX_FILE_NAME, [border], MINED_OUTPUT_FILENAME_START), (PILLAR_VERTEX_FILE_NAME, pillars, PILLAR_OUTPUT_FILENAME_START)):
+        with open(os.path.join(data_dir, filename), "w") as f:
+            for i, polygon in enumerate(polygons):
+                f.write(f"{start}{i + 1}\n")
+                f.write("".join(f"{x:.4f} {y:.4f}\n" for x, y in polygon))
+
+def render_layout(path, border, pillars, pixels_per_unit=4, draw_border=False):
+    """Draws the pillar outlines (and the border if draw_border) in black on a white PNG image at path."""
+    low, high = border.min(axis=0), border.max(axis=0)
+    size = np.ceil((high - low) * pixels_per_unit).astype(int) + 1
+    image = np.full((size[1], size[0], 3), 255, dtype=np.uint8)
+
+    # Image rows grow downwards, grid y upwards
+    def to_pixels(polygon):
+        return np.rint(np.column_stack([polygon[:, 0] - low[0], high[1] - polygon[:, 1]]) * pixels_per_unit).astype(np.int32)
+
+    outlines = [to_pixels(pillar) for pillar in pillars]
+    if draw_border:
+        outlines.append(to_pixels(border))
+    cv2.polylines(image, outlines, True, (0, 0, 0), 2)
+    cv2.imwrite(path, image)
+    return image.shape[:2]
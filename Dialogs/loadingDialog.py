@@ -1,6 +1,9 @@
+import time
+import queue
 import threading
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
+from metrics import estimate_remaining
 
 class MeshLoader:
     def __init__(self, mainloop, meshing_function):
@@ -8,12 +11,17 @@ class MeshLoader:
         self.meshing_function = meshing_function
         self.stop_event = threading.Event()
         self.meshing_thread = None
+        self.updates = queue.Queue()
+        self.plot_func = None
+        self.stage_name = None
+        self.stage_started = None
 
         self.loading_bar_size = 200
+        self.poll_interval_ms = 50
 
         self.window = tk.Toplevel(self.mainloop)
         self.window.title("Generating Mesh")
-        self.window.geometry("300x130")
+        self.window.geometry("300x155")
 
         # Progress bar
         self.progress = ttk.Progressbar(self.window, orient="horizontal", length=250, mode="determinate")
@@ -23,6 +31,10 @@ class MeshLoader:
         self.label = tk.Label(self.window, text="Meshing the area...", font=("Helvetica", 12))
         self.label.pack(pady=5)
 
+        # Current stage and estimated time left
+        self.stage_label = tk.Label(self.window, text="", font=("Helvetica", 10))
+        self.stage_label.pack()
+
         # Cancel button
         cancel_button = tk.Button(self.window, text="Cancel", command=self.cancel_all)
         cancel_button.pack(pady=5)
@@ -32,8 +44,73 @@ class MeshLoader:
 
     def start_meshing(self, max_area, plot_func):
         """Start the meshing process in a separate thread."""
-        self.meshing_thread = threading.Thread(target=self.meshing_function, args=(self.window, self.progress, self.label, self.stop_event, max_area, plot_func))
+        self.plot_func = plot_func
+        self.meshing_thread = threading.Thread(target=self.run_meshing, args=(max_area,), daemon=True)
         self.meshing_thread.start()
+        self.window.after(self.poll_interval_ms, self.poll_updates)
+
+    def run_meshing(self, max_area):
+        """Runs the meshing function on the worker thread and queues its outcome for the Tk thread."""
+        try:
+            completed = self.meshing_function(max_area, self.stop_event, self.report_progress, self.report_metrics)
+            self.updates.put(("done", completed))
+        except Exception as e:
+            print(e)
+            self.updates.put(("error", e))
+
+    def report_progress(self, message, fraction):
+        """Progress callback for the meshing thread. Widgets are only touched from poll_updates."""
+        self.updates.put(("progress", (message, fraction)))
+
+    def report_metrics(self, event):
+        """Metrics callback for the meshing thread, queued like progress updates."""
+        if event['event'] == 'stage_start':
+            self.updates.put(("stage", event['stage']))
+
+    def show_stage(self, fraction=None):
+        """Shows the current stage with its elapsed time and, once it reports progress, the time left."""
+        if self.stage_name is None:
+            return
+        elapsed = time.monotonic() - self.stage_started
+        text = f"Stage: {self.stage_name} ({elapsed:.0f} s"
+        remaining = estimate_remaining(elapsed, fraction)
+        if remaining is not None:
+            text += f", about {remaining:.0f} s left"
+        self.stage_label["text"] = text + ")"
+
+    def poll_updates(self):
+        """Applies queued updates on the Tk thread and reschedules itself until meshing ends."""
+        if not self.window.winfo_exists():
+            return
+
+        while True:
+            try:
+                kind, value = self.updates.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                message, fraction = value
+                self.label["text"] = message
+                if fraction is not None:
+                    self.progress['value'] = fraction * 100
+                self.show_stage(fraction)
+            elif kind == "stage":
+                self.stage_name = value
+                self.stage_started = time.monotonic()
+                self.show_stage()
+            elif kind == "done":
+                self.cleanup()
+                print("Exited the mesh generator and closed all files")
+                if value and self.plot_func is not None:
+                    self.plot_func()
+                return
+            elif kind == "error":
+                self.cleanup()
+                messagebox.showerror("Error", f"Meshing failed.\n{value}")
+                return
+
+        self.window.after(self.poll_interval_ms, self.poll_updates)
 
     def cancel_all(self):
         """Handle cancelation of all threads and close the loading screen."""
@@ -44,4 +121,4 @@ class MeshLoader:
     def cleanup(self):
         """Cleanup resources and close the loading screen."""
         if hasattr(self, 'window') and self.window.winfo_exists():
-            self.window.destroy()  # Close the loading screen
\ No newline at end of file
+            self.window.destroy()  # Close the loading screen
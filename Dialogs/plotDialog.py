@@ -3,35 +3,113 @@ import numpy as np
 import matplotlib
 matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
-from constants import MINED_OUTPUT_FILENAME_START, ELEMENT_FILE_EXT
+from constants import MINED_OUTPUT_FILENAME_START, ELEMENT_FILE_EXT, PLOT_MAX_VISIBLE_EDGES, PLOT_MINED_COLOR, PLOT_PILLAR_COLOR
+from mesh_writer import load_sidecar, parse_element_coords
+from valence import edge_keys
+
+def keys_to_edges(keys, num_vertices):
+    return np.column_stack([keys // num_vertices, keys % num_vertices])
+
+def edge_lines(vertices, edges):
+    """Returns x and y arrays drawing every edge as one NaN-separated polyline.
+
+    A single line with gaps renders much faster than one artist or path per edge.
+    """
+    points = np.full((len(edges), 3, 2), np.nan)
+    points[:, 0] = vertices[edges[:, 0]]
+    points[:, 1] = vertices[edges[:, 1]]
+    points = points.reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+class MeshView:
+    """Draws merged meshes as one line per colour with level of detail.
+
+    All files share one vertex table and every edge is drawn once, in the pillar
+    colour if it touches a pillar. The outlines of the pillars and the border are
+    always drawn. The triangle edges are only drawn for the visible part of the
+    plot once it holds at most max_edges of them, so zoomed out views stay light.
+    """
+
+    def __init__(self, axes, mesh_data, max_edges=PLOT_MAX_VISIBLE_EDGES):
+        self.axes = axes
+        self.max_edges = max_edges
+        self.last_view = None
+
+        # One vertex table for all files, joining the copies of shared vertices
+        all_vertices = np.vstack([mesh["vertices"] for mesh, _ in mesh_data])
+        self.vertices, inverse = np.unique(all_vertices, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        num_vertices = len(self.vertices)
+
+        # Edge keys per colour, and the outline edges (used by one triangle) of every file
+        edges = {}
+        outlines = {}
+        offset = 0
+        for mesh, color in mesh_data:
+            triangles = inverse[mesh["triangles"] + offset]
+            keys = edge_keys(triangles, np.roll(triangles, -1, axis=1), num_vertices).ravel()
+            offset += len(mesh["vertices"])
+            unique, counts = np.unique(keys, return_counts=True)
+            edges.setdefault(color, []).append(unique)
+            outlines.setdefault(color, []).append(unique[counts == 1])
+        edges = {color: np.unique(np.concatenate(keys)) for color, keys in edges.items()}
+        outlines = {color: np.unique(np.concatenate(keys)) for color, keys in outlines.items()}
+
+        # Edges on a pillar are drawn in the pillar colour only
+        if PLOT_MINED_COLOR in edges:
+            for color in edges:
+                if color != PLOT_MINED_COLOR:
+                    edges[PLOT_MINED_COLOR] = np.setdiff1d(edges[PLOT_MINED_COLOR], edges[color], assume_unique=True)
+                    outlines[PLOT_MINED_COLOR] = np.setdiff1d(outlines[PLOT_MINED_COLOR], outlines[color], assume_unique=True)
+
+        self.detail_edges = {}
+        self.detail_lines = {}
+        for color, keys in edges.items():
+            self.detail_edges[color] = keys_to_edges(keys, num_vertices)
+            self.detail_lines[color], = axes.plot([], [], color=color, linewidth=0.5)
+
+        for color, keys in outlines.items():
+            axes.plot(*edge_lines(self.vertices, keys_to_edges(keys, num_vertices)), color=color, linewidth=1.0)
+
+        axes.callbacks.connect("xlim_changed", self.update)
+        axes.callbacks.connect("ylim_changed", self.update)
+        self.update(axes)
+
+    def update(self, axes):
+        """Shows the triangle edges inside the current view, or only outlines when there are too many."""
+        (x0, x1), (y0, y1) = sorted(axes.get_xlim()), sorted(axes.get_ylim())
+        if self.last_view == (x0, x1, y0, y1):
+            return
+        self.last_view = (x0, x1, y0, y1)
+
+        visible = {}
+        for color, pairs in self.detail_edges.items():
+            a, b = self.vertices[pairs[:, 0]], self.vertices[pairs[:, 1]]
+            inside = (np.minimum(a[:, 0], b[:, 0]) <= x1) & (np.maximum(a[:, 0], b[:, 0]) >= x0) & (np.minimum(a[:, 1], b[:, 1]) <= y1) & (np.maximum(a[:, 1], b[:, 1]) >= y0)
+            visible[color] = pairs[inside]
+
+        show_detail = sum(len(pairs) for pairs in visible.values()) <= self.max_edges
+        for color, line in self.detail_lines.items():
+            line.set_data(*edge_lines(self.vertices, visible[color]) if show_detail else ([], []))
 
 class Plotter:
     def __init__(self, folder_path):
         self.folder_path = folder_path
 
     def read_file(self, file_path):
-        """Reads a single .tri file and extracts vertex and triangle data."""
-        vertices = []
-        triangles = []
-        with open(file_path, "r") as file:
-            for line in file:
-                if line.startswith("E_LT:"):
-                    parts = line.split(";")[-1].strip().split()
-                    coords = list(map(float, parts))
-                    # Ensure we are appending triplets of points (x1, y1, x2, y2, x3, y3)
-                    vertices.append([coords[0], coords[1]])  # x1, y1
-                    vertices.append([coords[2], coords[3]])  # x2, y2
-                    vertices.append([coords[4], coords[5]])  # x3, y3
-                    idx = len(vertices)
-                    triangles.append([idx - 3, idx - 2, idx - 1])
-
-        vertices = np.array(vertices)
-
-        # Check the shape of the vertices array
-        if vertices.ndim == 1:
-            vertices = vertices.reshape(-1, 2)  # Reshape to ensure it's a 2D array
-
-        return {"vertices": vertices, "triangles": np.array(triangles)}
+        """Reads a single .tri file and extracts vertex and triangle data.
+
+        The binary sidecar the mesher can write next to the file is memory-mapped
+        instead when it is up to date.
+        """
+        coords = load_sidecar(file_path)
+        if coords is None:
+            coords = parse_element_coords(file_path)
+
+        # Every triangle keeps its own three vertices (x1, y1, x2, y2, x3, y3)
+        vertices = coords.reshape(-1, 2)
+        triangles = np.arange(len(vertices)).reshape(-1, 3)
+        return {"vertices": vertices, "triangles": triangles}
 
     def read_mesh_data(self):
         """Reads all .tri files in the folder and organizes them by color."""
@@ -43,20 +121,16 @@ class Plotter:
             if filename.endswith(f".{ELEMENT_FILE_EXT}"):
                 file_path = os.path.join(self.folder_path, filename)
                 mesh = self.read_file(file_path)
-                color = "gray" if filename.startswith(MINED_OUTPUT_FILENAME_START) else "blue"
+                color = PLOT_MINED_COLOR if filename.startswith(MINED_OUTPUT_FILENAME_START) else PLOT_PILLAR_COLOR
                 mesh_data.append((mesh, color))
         return mesh_data
 
     def plot_mesh(self, mesh_data):
         """Plots mesh data using matplotlib."""
         plt.figure(figsize=(10, 8))
-        for mesh, color in mesh_data:
-            plt.triplot(
-                mesh["vertices"][:, 0],  # x-coordinates
-                mesh["vertices"][:, 1],  # y-coordinates
-                mesh["triangles"],       # triangle connectivity
-                color=color,
-            )
+        mesh_data = [(mesh, color) for mesh, color in mesh_data if len(mesh["triangles"])]
+        if mesh_data:
+            self.view = MeshView(plt.gca(), mesh_data)  # Kept so its zoom callbacks stay alive
 
         plt.gcf().canvas.manager.set_window_title('PolyMesh - Mesh Plot') 
         plt.title("Mesh Plot")
@@ -3,12 +3,20 @@ import cv2
 import os
 import customtkinter
 import subprocess
+import shutil
+import time
+import multiprocessing
 
 from CTkMenuBar import *
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 from Dialogs.loadingDialog import MeshLoader
+from image_analysis import ImageAnalyzer, PackedPolygons
+from image_source import ImageSource
+from preview_worker import PreviewWorker
 from mesher import Mesher
+from mesh_writer import ElementNaming, naming_for_pillars
+from pslg import read_pillar_file
 from Dialogs.plotDialog import Plotter
 from Dialogs.gridSizeDialog import GridSizeDialog
 from Dialogs.triangleSizeDialog import TriangleSizeDialog
@@ -26,10 +34,16 @@ class PolyMesh:
 
         self.dialog_scale_factor = 1.5
         self.current_image_path = self.path_to_select_image
-        self.image1 = cv2.imread(self.current_image_path)
-        self.polygons = []
+        self.load_image(self.current_image_path)
+        self.polygons = PackedPolygons()
+        self.border_polygons = PackedPolygons()
+        self.layout_mode = False  # Find the border and the pillars together in one combined image
         self.canvas_image = None
-        self.pillar_image = None
+        self.pending_update = None
+
+        # Polygon detection and preview drawing run on a worker thread, results are polled from the Tk loop
+        self.preview_worker = PreviewWorker(self.render_preview)
+        self.pending_preview_poll = None
 
         # Create the main Tkinter window
         customtkinter.set_appearance_mode("light")
@@ -79,6 +93,7 @@ class PolyMesh:
         save_menu_drop._corner_radius = 0
         save_menu_drop.add_option(option="Save Border", command=self.save_outline)
         save_menu_drop.add_option(option="Save Pillars", command=self.save_pillars)
+        save_menu_drop.add_option(option="Save Border and Pillars", command=self.save_layout)
 
         # # Mesh Menu
         mesh_menu_drop = CustomDropdownMenu(mesh_menu)
@@ -116,7 +131,7 @@ class PolyMesh:
             self.sliders_frame,
             from_=1,
             to=1000,
-            command=lambda x: self.update_image(),
+            command=lambda x: self.schedule_update(),
         )
         self.epsilon_slider.set(100)
         self.epsilon_slider.pack(side="left", padx=15)
@@ -128,7 +143,7 @@ class PolyMesh:
             self.sliders_frame,
             from_=0,
             to=1000,
-            command=lambda x: self.update_image(),
+            command=lambda x: self.schedule_update(),
         )
         self.min_distance_slider.set(0)
         self.min_distance_slider.pack(side="left", padx=15)
@@ -155,8 +170,7 @@ class PolyMesh:
         self.canvas.config(width=canvas_width, height=canvas_height)
 
         # Resize the image to fit the fullscreen canvas
-        image_rgb = cv2.cvtColor(self.image1, cv2.COLOR_BGR2RGB)
-        resized_image = self.resize_image_to_fit_canvas(image_rgb, canvas_width, canvas_height)
+        resized_image = cv2.cvtColor(self.image_analyzer.display_image(canvas_width, canvas_height)[0], cv2.COLOR_BGR2RGB)
 
         # Convert to Tkinter-compatible image
         image_pil = Image.fromarray(resized_image)
@@ -196,6 +210,9 @@ class PolyMesh:
                     command=lambda path=image_path: self.select_image(path)
                 )
 
+        self.image_menu_drop.add_separator()
+        self.image_menu_drop.add_option(option="Toggle Border and Pillars Mode", command=self.toggle_layout_mode)
+
     # Bind a click event to open the file explorer
     def open_project_path(self, event):
         print("Opening project path", self.project_path)
@@ -212,101 +229,153 @@ class PolyMesh:
         self._last_size = (event.width, event.height)
         
         # Update the canvas and the image
-        self.update_image()
+        self.schedule_update()
 
-    def find_polygons(self, image, canny_threshold1=50, canny_threshold2=150, epsilon_factor=0.01, min_vertex_distance=0):
-        if self.current_image_path == self.path_to_select_image:
-            return []
+    def schedule_update(self):
+        """Coalesces slider and resize events into one update_image call once they pause."""
+        if self.pending_update is not None:
+            self.root.after_cancel(self.pending_update)
+        self.pending_update = self.root.after(PREVIEW_DEBOUNCE_MS, self.run_scheduled_update)
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blurred, canny_threshold1, canny_threshold2)
+    def run_scheduled_update(self):
+        self.pending_update = None
+        self.update_image()
 
-        kernel = np.ones((3, 3), np.uint8)
-        edges = cv2.dilate(edges, kernel, iterations=1)
-        edges = cv2.erode(edges, kernel, iterations=1)
-        
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        polygons = []
-        for contour in contours:
-            epsilon = epsilon_factor * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
-            # polygons.append(approx)
-
-            # Filter vertices based on minimum distance
-            filtered_approx = []
-            for i, vertex in enumerate(approx):
-                if i == 0 or np.linalg.norm(vertex[0] - filtered_approx[-1][0]) > min_vertex_distance:
-                    filtered_approx.append(vertex)
-
-            polygons.append(np.array(filtered_approx))
-        
-        return polygons
+    def load_image(self, path):
+        """Makes the image at path the current image, with its own contour cache."""
+        self.current_image_path = path
+        self.image_source = ImageSource(path)
+
+        # A new analyzer per image, so a render still running on the previous one cannot mix up the caches
+        self.image_analyzer = ImageAnalyzer(self.image_source)
 
-    def resize_image_to_fit_canvas(self, image, canvas_width, canvas_height):
-        """Resize the image to fit within the canvas while preserving its aspect ratio."""
-        h, w = image.shape[:2]
-        scale = min(canvas_width / w, canvas_height / h)
-        new_width = int(w * scale)
-        new_height = int(h * scale)
-        resized_image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-        return resized_image
+    def find_polygons(self, image_analyzer, epsilon_factor=0.01, min_vertex_distance=0):
+        # Edges and contours are cached per image, only the approximation follows the sliders
+        return image_analyzer.polygons(epsilon_factor, min_vertex_distance)
 
     def quit_application(self):
+        self.preview_worker.stop()
         self.root.destroy()
 
     # Function to update the displayed image
     def update_image(self):
-        epsilon_factor = self.epsilon_slider.get() / 100000.0
-        min_vertex_distance = self.min_distance_slider.get() / 10.0
-        image_copy = self.image1.copy()
-        
-        # Find polygons
-        self.polygons = self.find_polygons(image_copy, epsilon_factor=epsilon_factor, min_vertex_distance=min_vertex_distance)
-        num_polygons = len(self.polygons)
-        num_vertices = sum(len(polygon) for polygon in self.polygons)
-
-        for i, polygon in enumerate(self.polygons):
-            avg_x = int(np.mean(polygon[:, 0, 0]))
-            avg_y = int(np.mean(polygon[:, 0, 1]))
-            for point in polygon:
-                x, y = point[0]
-                cv2.circle(image_copy, (x, y), 6, (19, 69, 139), -1)
-            cv2.putText(image_copy, str(i + 1), (avg_x - 3, avg_y - 3), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 0, 255), 2)
+        """Queues a preview render of the current image, slider values and canvas size."""
+        canvas_width = self.root.winfo_width()
+        canvas_height = self.root.winfo_height() - self.toolbar.winfo_height() - self.menu_bar.winfo_height()
+        self.preview_worker.submit({
+            'image_analyzer': self.image_analyzer,
+            'find_polygons': self.current_image_path != self.path_to_select_image,
+            'layout_mode': self.layout_mode,
+            'epsilon_factor': self.epsilon_slider.get() / 100000.0,
+            'min_vertex_distance': self.min_distance_slider.get() / 10.0,
+            'canvas_size': (canvas_width, canvas_height),
+        })
+
+        if self.pending_preview_poll is None:
+            self.pending_preview_poll = self.root.after(PREVIEW_POLL_MS, self.poll_preview)
+
+    def draw_polygons(self, image, polygons, scale=1.0, border_polygons=None):
+        """Draws the vertices, pillar numbers and counts onto image, with image coordinates scaled by scale.
+
+        The vertices of border_polygons, if given, are drawn without a number.
+        """
+        radius = max(1, round(6 * scale))
+        thickness = max(1, round(2 * scale))
+
+        if border_polygons is not None:
+            for x, y in np.rint(border_polygons.vertices * scale).astype(int).tolist():
+                cv2.circle(image, (x, y), radius, (19, 69, 139), -1)
+
+        points = np.rint(polygons.vertices * scale).astype(int).tolist()
+        for i, (avg_x, avg_y) in enumerate(polygons.centroids().astype(int).tolist()):
+            for x, y in points[polygons.offsets[i]:polygons.offsets[i + 1]]:
+                cv2.circle(image, (x, y), radius, (19, 69, 139), -1)
+            cv2.putText(image, str(i + 1), (round((avg_x - 3) * scale), round((avg_y - 3) * scale)), cv2.FONT_HERSHEY_COMPLEX, scale, (0, 0, 255), thickness)
 
         # Display number of polygons and vertices identified
-        cv2.putText(image_copy, f'Polygons: {num_polygons}', (30, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
-        cv2.putText(image_copy, f'Vertices: {num_vertices}', (30, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+        num_vertices = len(polygons.vertices)
+        cv2.putText(image, f'Polygons: {len(polygons)}', (round(30 * scale), round(30 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness)
+        cv2.putText(image, f'Vertices: {num_vertices}', (round(30 * scale), round(70 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness)
+        return image
 
-        # Resize image to fit canvas
-        canvas_width = self.root.winfo_width() 
-        canvas_height = self.root.winfo_height() - self.toolbar.winfo_height() - self.menu_bar.winfo_height()
-        image_rgb = cv2.cvtColor(image_copy, cv2.COLOR_BGR2RGB)
-        self.pillar_image = image_rgb
-        resized_image = self.resize_image_to_fit_canvas(image_rgb, canvas_width, canvas_height)
+    def render_preview(self, request):
+        """Finds the polygons and draws the preview. Runs on the preview worker thread."""
+        timings = {}
+        start = time.perf_counter()
+
+        # Find polygons
+        image_analyzer = request['image_analyzer']
+        polygons = PackedPolygons()
+        border_polygons = None
+        if request['find_polygons'] and request['layout_mode']:
+            image_analyzer.layout_contours()
+            timings['contours'] = time.perf_counter() - start
+            border_polygons, polygons = image_analyzer.layout_polygons(request['epsilon_factor'], request['min_vertex_distance'])
+            timings['approximate'] = time.perf_counter() - start - timings['contours']
+        elif request['find_polygons']:
+            image_analyzer.contours()
+            timings['contours'] = time.perf_counter() - start
+            polygons = self.find_polygons(image_analyzer, epsilon_factor=request['epsilon_factor'], min_vertex_distance=request['min_vertex_distance'])
+            timings['approximate'] = time.perf_counter() - start - timings['contours']
+
+        # The overlay is drawn on a copy of the cached display-size image, never on the full image
+        canvas_width, canvas_height = request['canvas_size']
+        base_image, scale = image_analyzer.display_image(canvas_width, canvas_height)
+        timings['resize'] = time.perf_counter() - start - sum(timings.values())
+
+        preview = self.draw_polygons(base_image.copy(), polygons, scale, border_polygons)
+        image_pil = Image.fromarray(cv2.cvtColor(preview, cv2.COLOR_BGR2RGB))
+        timings['draw'] = time.perf_counter() - start - sum(timings.values())
+
+        return {
+            'polygons': polygons,
+            'border_polygons': border_polygons,
+            'preview': image_pil,
+            'canvas_size': (canvas_width, canvas_height),
+            'timings': timings,
+        }
+
+    def poll_preview(self):
+        """Shows the newest finished preview and keeps polling while renders are outstanding."""
+        result = self.preview_worker.take_result()
+        if result is not None:
+            self.show_preview(result)
+
+        if self.preview_worker.pending():
+            self.pending_preview_poll = self.root.after(PREVIEW_POLL_MS, self.poll_preview)
+        else:
+            self.pending_preview_poll = None
+
+    def show_preview(self, result):
+        """Puts a rendered preview on the canvas. Tk images can only be created on the Tk thread."""
+        start = time.perf_counter()
+        self.polygons = result['polygons']
+        self.border_polygons = result['border_polygons'] or PackedPolygons()
 
         # Convert to Tkinter image
-        image_pil = Image.fromarray(resized_image)
-        image_tk = ImageTk.PhotoImage(image_pil)
+        image_tk = ImageTk.PhotoImage(result['preview'])
 
         # Calculate offsets to center the image on the canvas
-        image_width, image_height = resized_image.shape[1], resized_image.shape[0]
-        x_offset = (canvas_width - image_width) // 2
-        y_offset = (canvas_height - image_height) // 2
+        canvas_width, canvas_height = result['canvas_size']
+        x_offset = (canvas_width - image_tk.width()) // 2
+        y_offset = (canvas_height - image_tk.height()) // 2
 
         # Update the canvas
         self.canvas.itemconfig(self.canvas_image, image=image_tk)
         self.canvas.coords(self.canvas_image, x_offset, y_offset)
         self.canvas.image = image_tk  # Store reference to avoid garbage collection
 
+        timings = dict(result['timings'], display=time.perf_counter() - start)
+        print("Preview: " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items()))
+
     # Function to upload a new image
     def upload_image(self):
         file_path = filedialog.askopenfilename(filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg")])
         if file_path:
-            # Copy the image to the project folder give it a unique file name
+            # Copy the image file unchanged to the project folder, without decoding it
             new_image_path = os.path.join(self.project_path, os.path.basename(file_path))
-            cv2.imwrite(new_image_path, cv2.imread(file_path))          
+            if os.path.abspath(file_path) != os.path.abspath(new_image_path):
+                shutil.copyfile(file_path, new_image_path)
 
             self.select_image(new_image_path)
 
@@ -314,8 +383,7 @@ class PolyMesh:
 
     def select_image(self, path):
         if os.path.exists(path):
-            self.current_image_path = path
-            self.image1 = cv2.imread(path)
+            self.load_image(path)
             self.update_image()
 
     def _get_data_folder_path(self):
@@ -329,6 +397,12 @@ class PolyMesh:
 
     # Function to save polygons to a text file
     def save_polygons(self, pillars=True):
+        # In border and pillars mode the preview keeps the pillars in polygons and the border apart
+        polygons = self.polygons if pillars or not self.layout_mode else self.border_polygons
+        if not pillars and self.layout_mode and len(polygons) == 0:
+            messagebox.showerror("Error", "No border found in the image.")
+            return
+
         dialog = GridSizeDialog(self.root, title="Grid Size Input", scale_factor=self.dialog_scale_factor)
         grid_max_x = dialog.grid_max_x
         grid_max_y = dialog.grid_max_y
@@ -339,20 +413,62 @@ class PolyMesh:
         if not os.path.exists(self._get_data_folder_path()):
             os.makedirs(self._get_data_folder_path())
 
-        height, width = self.image1.shape[:2]
         filename = os.path.join(self._get_data_folder_path(), PILLAR_VERTEX_FILE_NAME) if pillars else os.path.join(self._get_data_folder_path(), BORDER_VERTEX_FILE_NAME)
+        self.write_polygons(filename, polygons, pillars, grid_max_x, grid_max_y)
+
+        # Save current image to the data folder
+        if pillars:
+            self.save_pillar_image(polygons, self.border_polygons if self.layout_mode else None)
+
+    def write_polygons(self, filename, polygons, pillars, grid_max_x, grid_max_y):
+        """Writes polygons in image pixels to a vertex file in grid coordinates."""
+        height, width = self.image_source.shape
         with open(filename, "w") as f:
-            for i, polygon in enumerate(self.polygons):
+            for i, polygon in enumerate(polygons):
                 f.write(f"{PILLAR_OUTPUT_FILENAME_START if pillars else MINED_OUTPUT_FILENAME_START}{i+1}\n")
-                for point in polygon:
-                    x, y = point[0]
+                for x, y in polygon:
                     actual_x = (x / width) * grid_max_x
                     actual_y = grid_max_y - (y / height) * grid_max_y
                     f.write(f"{actual_x:.4f} {actual_y:.4f}\n")
 
-        # Save current image to the data folder
-        if pillars and self.pillar_image is not None:
-            cv2.imwrite(os.path.join(self._get_data_folder_path(), PILLAR_NUMBERS_IMAGE), self.pillar_image)
+    def save_pillar_image(self, polygons, border_polygons=None):
+        # Only built here, the preview is drawn at display resolution
+        pillar_image = self.draw_polygons(self.image_source.color(), polygons, border_polygons=border_polygons)
+        cv2.imwrite(os.path.join(self._get_data_folder_path(), PILLAR_NUMBERS_IMAGE), pillar_image)
+
+    # Function to save the border and the pillars found in one combined layout image
+    def save_layout(self):
+        if self.current_image_path == self.path_to_select_image:
+            messagebox.showerror("Error", "Please select a layout image first.")
+            return
+
+        epsilon_factor = self.epsilon_slider.get() / 100000.0
+        min_vertex_distance = self.min_distance_slider.get() / 10.0
+        border_polygons, pillar_polygons = self.image_analyzer.layout_polygons(epsilon_factor, min_vertex_distance)
+        if len(border_polygons) == 0:
+            messagebox.showerror("Error", "No border found in the image.")
+            return
+
+        dialog = GridSizeDialog(self.root, title="Grid Size Input", scale_factor=self.dialog_scale_factor)
+        grid_max_x = dialog.grid_max_x
+        grid_max_y = dialog.grid_max_y
+
+        if grid_max_x is None or grid_max_y is None:
+            return
+
+        if not os.path.exists(self._get_data_folder_path()):
+            os.makedirs(self._get_data_folder_path())
+
+        self.write_polygons(os.path.join(self._get_data_folder_path(), BORDER_VERTEX_FILE_NAME), border_polygons, False, grid_max_x, grid_max_y)
+        self.write_polygons(os.path.join(self._get_data_folder_path(), PILLAR_VERTEX_FILE_NAME), pillar_polygons, True, grid_max_x, grid_max_y)
+        self.save_pillar_image(pillar_polygons, border_polygons)
+        print(f"Saved the border and {len(pillar_polygons)} pillars")
+
+    def toggle_layout_mode(self):
+        """Switches the preview between outlines of one kind and a combined border and pillars image."""
+        self.layout_mode = not self.layout_mode
+        print(f"Border and pillars mode {'on' if self.layout_mode else 'off'}")
+        self.update_image()
 
     def new_project(self):
         dialog = NewProjectDialog(self.root, title="Create New Project", scale_factor=self.dialog_scale_factor)
@@ -364,7 +480,7 @@ class PolyMesh:
 
             self.populate_select_menu()
 
-            self.image1 = cv2.imread(self.current_image_path)
+            self.load_image(self.current_image_path)
 
 
     def open_project(self):
@@ -383,13 +499,12 @@ class PolyMesh:
                 if f.lower().endswith(('.png', '.jpg'))
             ]
             if image_files:
-                self.current_image_path = image_files[0]
-                self.image1 = cv2.imread(image_files[0])
+                self.load_image(image_files[0])
                 self.update_image()
             
             self.populate_select_menu()
         else:
-            self.image1 = cv2.imread(self.current_image_path)
+            self.load_image(self.current_image_path)
 
     def save_outline(self):
         self.save_polygons(pillars=False)
@@ -415,7 +530,16 @@ class PolyMesh:
             messagebox.showerror("Error", "No border found. Please save the border first.")
             return
 
-        mesher = Mesher(self.project_path)
+        # Layouts with more pillars than the default names can number need wider records, only with consent
+        num_pillars = len(read_pillar_file(pillar_file)[1]) - 1
+        naming = naming_for_pillars(num_pillars)
+        if naming != ELEMENT_NAMING:
+            default, wide = ElementNaming(ELEMENT_NAMING), ElementNaming(naming)
+            question = (f"The layout has {num_pillars} pillars, more than the {default.max_pillars} the {default.scheme} element names can number.\n\n"
+                        f"Write the mesh with {wide.name_length} character {wide.scheme} element names instead? The solver must read the wider records.")
+            if not messagebox.askyesno("Element Naming", question):
+                return
+        mesher = Mesher(self.project_path, element_naming=naming)
         dialog = TriangleSizeDialog(self.root, title="Mesh Triangle Size Input", scale_factor=self.dialog_scale_factor)
         max_area = dialog.triangle_size
         if max_area is not None:
@@ -428,6 +552,8 @@ class PolyMesh:
         plotter.plot_mesh(plotter.read_mesh_data())
 
 if __name__ == "__main__":
+    # Output formatting can use worker processes, which frozen executables must support
+    multiprocessing.freeze_support()
     try:
         PolyMesh()
     except Exception as e:
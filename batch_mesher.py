@@ -0,0 +1,229 @@
+import argparse
+import csv
+import os
+import sys
+import time
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from mesher import Mesher
+from constants import *
+
+# Batch meshing of every project below a folder
+# Run from the repository root: python -m batch_mesher projects_folder --max-area 0.5
+
+SUMMARY_COLUMNS = ["project", "status", "pillars", "triangles"] + [f"{stage} (s)" for stage in MESH_STAGES] + ["total (s)", "error"]
+
+def find_projects(root):
+    """Returns every folder below root (root included) that holds a border and pillar file."""
+    projects = []
+    for folder, subfolders, _ in os.walk(root):
+        subfolders.sort()
+        data_folder = os.path.join(folder, DATA_FOLDER_NAME)
+        if os.path.isfile(os.path.join(data_folder, BORDER_VERTEX_FILE_NAME)) and os.path.isfile(os.path.join(data_folder, PILLAR_VERTEX_FILE_NAME)):
+            projects.append(folder)
+            subfolders.clear()  # A project's own folders are not searched for nested projects
+    return projects
+
+def available_memory():
+    """Returns the physical memory currently available in bytes, or None if it cannot be read."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    if sys.platform == "win32":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong), ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong), ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong), ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong), ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    return None
+
+def estimate_job_memory(project_dir, max_area):
+    """Estimates the peak memory of meshing one project from its border area and max_area."""
+    border_file = os.path.join(project_dir, DATA_FOLDER_NAME, BORDER_VERTEX_FILE_NAME)
+    try:
+        border = Mesher(project_dir).read_vertices_from_file(border_file)
+    except (OSError, ValueError):
+        return BATCH_JOB_BASE_MEMORY
+
+    if len(border) < 3:
+        return BATCH_JOB_BASE_MEMORY
+    x, y = border[:, 0], border[:, 1]
+    area = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+    # Quality meshing averages roughly half the maximum area per triangle
+    triangles = 2 * area / max_area
+    return BATCH_JOB_BASE_MEMORY + int(triangles * MESH_BYTES_PER_TRIANGLE)
+
+def mesh_project(project_dir, max_area, classification_mode, use_cache=True, element_naming=ELEMENT_NAMING):
+    """Meshes one project in a worker process and returns its summary row."""
+    row = {"project": project_dir, "status": "ok", "pillars": 0, "triangles": 0, "error": ""}
+    start = time.perf_counter()
+
+    # Jobs already run in parallel, so each one formats its output on its own thread
+    mesher = Mesher(project_dir, classification_mode=classification_mode, output_workers=1, use_cache=use_cache, element_naming=element_naming)
+    try:
+        mesher.mesh_area(max_area)
+    except Exception as e:
+        row["status"] = "failed"
+        row["error"] = f"{type(e).__name__}: {e}"
+        row["traceback"] = traceback.format_exc()
+
+    row["pillars"] = mesher.pillars
+    row["triangles"] = mesher.triangles
+    row["stage_times"] = dict(mesher.stage_times)
+    row["total"] = time.perf_counter() - start
+    return row
+
+def crashed_row(project, error, total):
+    """Returns the summary row of a project whose worker process died."""
+    message = f"{type(error).__name__}: {error}"
+    return {"project": project, "status": "failed", "pillars": 0, "triangles": 0, "error": message, "traceback": message, "stage_times": {}, "total": total}
+
+class BatchMesher:
+    """Meshes many projects across a process pool.
+
+    At most `jobs` projects run at once, and a project only starts when the
+    estimated memory of all running projects still fits in memory_fraction of
+    the available memory. One project is always allowed to run so a single
+    oversized project cannot stall the batch.
+
+    A worker process that dies (out of memory, a crash in triangle) breaks the
+    whole pool. Every project running in it is recorded as failed and the pool
+    is rebuilt for the projects still pending. Finished rows are kept in
+    self.rows, so they can be reported even when the batch is interrupted.
+    """
+
+    def __init__(self, projects, max_area, jobs=None, memory_fraction=BATCH_MEMORY_FRACTION, classification_mode=CLASSIFICATION_MODE, use_cache=True, element_naming=ELEMENT_NAMING):
+        self.projects = projects
+        self.max_area = max_area
+        self.jobs = jobs or os.cpu_count() or 1
+        self.memory_fraction = memory_fraction
+        self.classification_mode = classification_mode
+        self.use_cache = use_cache
+        self.element_naming = element_naming
+        self.rows = []
+
+    def run(self, report=print):
+        memory = available_memory()
+        budget = None if memory is None else memory * self.memory_fraction
+        pending = [(project, estimate_job_memory(project, self.max_area)) for project in self.projects]
+        self.rows = rows = []
+
+        while pending:
+            self.run_pool(pending, budget, rows, report)
+
+        order = {project: i for i, project in enumerate(self.projects)}
+        rows.sort(key=lambda row: order[row["project"]])
+        return rows
+
+    def run_pool(self, pending, budget, rows, report):
+        """Runs pending projects on one process pool until all are done or the pool breaks."""
+        running = {}  # future: (project, estimate, start)
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                # Start every pending project that fits next to the running ones
+                broken = False
+                in_use = sum(estimate for _, estimate, _ in running.values())
+                for job in list(pending):
+                    if len(running) >= self.jobs:
+                        break
+                    project, estimate = job
+                    if running and budget is not None and in_use + estimate > budget:
+                        continue
+                    try:
+                        future = executor.submit(mesh_project, project, self.max_area, self.classification_mode, self.use_cache, self.element_naming)
+                    except BrokenProcessPool:
+                        broken = True  # The running projects are collected below
+                        break
+                    pending.remove(job)
+                    running[future] = (project, estimate, time.perf_counter())
+                    in_use += estimate
+                    report(f"Started {project} (estimated {estimate / 2**20:.0f} MiB)")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                while done:
+                    for future in done:
+                        project, _, start = running.pop(future)
+                        try:
+                            row = future.result()
+                        except BrokenProcessPool as e:
+                            row = crashed_row(project, e, time.perf_counter() - start)
+                            broken = True
+                        rows.append(row)
+                        if row["status"] == "ok":
+                            report(f"Finished {row['project']}: {row['triangles']} triangles in {row['total']:.1f} s")
+                        else:
+                            report(f"Failed {row['project']}: {row['error']}")
+                    # Every project still running ends with a broken pool
+                    done = wait(running)[0] if broken else ()
+
+                if broken:
+                    if pending:
+                        report(f"Restarting the worker pool for {len(pending)} pending projects")
+                    return
+
+def summary_table(rows):
+    """Returns the summary rows as lists of strings in SUMMARY_COLUMNS order."""
+    table = []
+    for row in rows:
+        stage_times = row.get("stage_times", {})
+        table.append(
+            [row["project"], row["status"], str(row["pillars"]), str(row["triangles"])]
+            + [f"{stage_times[stage]:.2f}" if stage in stage_times else "-" for stage in MESH_STAGES]
+            + [f"{row['total']:.2f}", row["error"]]
+        )
+    return table
+
+def print_summary(rows, file=sys.stdout):
+    table = [SUMMARY_COLUMNS] + summary_table(rows)
+    widths = [max(len(line[i]) for line in table) for i in range(len(SUMMARY_COLUMNS))]
+    for line in table:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip(), file=file)
+
+def write_summary(rows, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_COLUMNS)
+        writer.writerows(summary_table(rows))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m batch_mesher", description="Mesh every PolyMesh project below a folder.")
+    parser.add_argument("root", help="folder searched for project folders")
+    parser.add_argument("--max-area", type=float, required=True, help="maximum triangle area")
+    parser.add_argument("--jobs", type=int, default=None, help="projects meshed at the same time (default: one per CPU core)")
+    parser.add_argument("--memory-fraction", type=float, default=BATCH_MEMORY_FRACTION, help="share of available memory the running jobs may use")
+    parser.add_argument("--classification", choices=[CLASSIFY_BY_CENTROID, CLASSIFY_BY_REGION], default=CLASSIFICATION_MODE, help="how triangles are assigned to pillars")
+    parser.add_argument("--no-cache", action="store_true", help="always triangulate, ignoring each project's mesh cache")
+    parser.add_argument("--naming", choices=ELEMENT_NAMINGS, default=ELEMENT_NAMING, help="element naming scheme, sharded and wide allow larger meshes than legacy")
+    parser.add_argument("--summary", help="also write the summary table to this CSV file")
+    args = parser.parse_args(argv)
+
+    projects = find_projects(args.root)
+    if not projects:
+        print(f"No projects found below {args.root}", file=sys.stderr)
+        return 1
+
+    batch = BatchMesher(projects, args.max_area, jobs=args.jobs, memory_fraction=args.memory_fraction, classification_mode=args.classification, use_cache=not args.no_cache, element_naming=args.naming)
+    try:
+        rows = batch.run(report=lambda message: print(message, file=sys.stderr, flush=True))
+    finally:
+        # Whatever finished is reported, also when the batch is interrupted
+        print_summary(batch.rows)
+        if args.summary:
+            write_summary(batch.rows, args.summary)
+
+    for row in rows:
+        if row["status"] != "ok":
+            print(f"\n{row['project']}\n{row['traceback']}", file=sys.stderr)
+    return 1 if any(row["status"] != "ok" for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import numpy as np
+from constants import MINED_REGION_ID, PILLAR_OUTPUT_FILENAME_START
+from spatial_index import PolygonIndex
+
+# Batched pillar classification of mesh triangles.
+# Region ids follow the output file numbering: MINED_REGION_ID for the mined area and n for pillar P{n}.
+
+def triangle_centroids(vertices, triangles):
+    """Returns the centroid of every triangle as an (n, 2) array."""
+    return vertices[triangles].mean(axis=1)
+
+def points_in_polygon(points, polygon):
+    """Vectorized even-odd test of many points against one polygon.
+
+    Mirrors Mesher.is_point_in_polygon edge for edge, so points on edges and
+    vertices are classified exactly like the per-point version.
+    """
+    points = np.asarray(points, dtype=float)
+    polygon = np.asarray(polygon, dtype=float)
+    inside = np.zeros(len(points), dtype=bool)
+    if len(points) == 0 or len(polygon) == 0:
+        return inside
+
+    x = points[:, 0]
+    y = points[:, 1]
+    p1 = polygon
+    p2 = np.roll(polygon, -1, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for (p1x, p1y), (p2x, p2y) in zip(p1.tolist(), p2.tolist()):
+            # Horizontal edges can never satisfy min(y) < y <= max(y)
+            if p1y == p2y:
+                continue
+            crossing = (y > min(p1y, p2y)) & (y <= max(p1y, p2y)) & (x <= max(p1x, p2x))
+            if p1x != p2x:
+                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                crossing &= x <= xinters
+            inside ^= crossing
+    return inside
+
+def points_in_polygons(points, polygon_ids, vertices, offsets):
+    """Vectorized even-odd test of point i against polygon polygon_ids[i].
+
+    Polygons are packed as one vertex array plus offsets, as in PolygonIndex.
+    Every pair walks its polygon's edges in lockstep, so the Python loop runs
+    once per edge of the largest polygon instead of once per point or polygon.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    polygon_ids = np.asarray(polygon_ids, dtype=np.int64)
+    inside = np.zeros(len(points), dtype=bool)
+    if len(points) == 0:
+        return inside
+
+    # Pairs with the most edges first, so the active pairs are always a prefix
+    starts = offsets[polygon_ids]
+    sizes = offsets[polygon_ids + 1] - starts
+    order = np.argsort(-sizes, kind="stable")
+    starts = starts[order]
+    sizes = sizes[order]
+    x = points[order, 0]
+    y = points[order, 1]
+    toggles = np.zeros(len(points), dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k in range(int(sizes[0]) if len(sizes) else 0):
+            active = np.searchsorted(-sizes, -k, side="left")
+            p1 = vertices[starts[:active] + k]
+            p2 = vertices[starts[:active] + (k + 1) % sizes[:active]]
+            xa = x[:active]
+            ya = y[:active]
+            crossing = (ya > np.minimum(p1[:, 1], p2[:, 1])) & (ya <= np.maximum(p1[:, 1], p2[:, 1])) & (xa <= np.maximum(p1[:, 0], p2[:, 0]))
+            xinters = (ya - p1[:, 1]) * (p2[:, 0] - p1[:, 0]) / (p2[:, 1] - p1[:, 1]) + p1[:, 0]
+            crossing &= (p1[:, 0] == p2[:, 0]) | (xa <= xinters)
+            toggles[:active] ^= crossing
+
+    inside[order] = toggles
+    return inside
+
+def classify_points(points, holes, index=None):
+    """Returns the region id of every point.
+
+    A point belongs to the first hole that contains it, the same precedence as
+    the original per-triangle loop in Mesher.mesh_area. Pass a PolygonIndex built
+    from the holes to reuse it between calls.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if index is None:
+        index = PolygonIndex(holes)
+
+    region_ids = np.full(len(points), MINED_REGION_ID, dtype=np.int64)
+    point_ids, hole_ids = index.candidates(points)
+    inside = points_in_polygons(points[point_ids], hole_ids, index.vertices, index.offsets)
+    point_ids = point_ids[inside]
+    hole_ids = hole_ids[inside]
+
+    # Candidates are sorted by point and then hole, so the first hit per point wins
+    point_ids, first = np.unique(point_ids, return_index=True)
+    region_ids[point_ids] = hole_ids[first] + 1
+    return region_ids
+
+def classify_triangles(vertices, triangles, holes, index=None, chunk_size=None, stop_event=None, progress=None):
+    """Returns the region id of every triangle based on its centroid.
+
+    With chunk_size the triangles are classified that many at a time, so the
+    centroids and candidate pairs held at once do not grow with the mesh. Between
+    chunks progress(fraction) is called and stop_event is checked; None is
+    returned if it was set.
+    """
+    if chunk_size is None:
+        return classify_points(triangle_centroids(vertices, triangles), holes, index)
+
+    if index is None:
+        index = PolygonIndex(holes)
+    region_ids = np.empty(len(triangles), dtype=np.int64)
+    for start in range(0, len(triangles), chunk_size):
+        if stop_event is not None and stop_event.is_set():
+            return None
+        chunk = triangles[start:start + chunk_size]
+        region_ids[start:start + len(chunk)] = classify_points(triangle_centroids(vertices, chunk), holes, index)
+        if progress is not None:
+            progress((start + len(chunk)) / len(triangles))
+    return region_ids
+
+def polygon_interior_point(polygon, max_scanlines=64):
+    """Returns a point strictly inside a simple polygon, or None if it has no area.
+
+    Horizontal scanlines are placed halfway between consecutive vertex heights so
+    they never pass through a vertex. The midpoint of the widest inside span over
+    all scanlines is returned, which keeps the seed well away from the boundary
+    even for concave pillars.
+    """
+    polygon = np.asarray(polygon, dtype=float)
+    heights = np.unique(polygon[:, 1])
+    if len(polygon) < 3 or len(heights) < 2:
+        return None
+
+    scanlines = (heights[:-1] + heights[1:]) / 2
+    if len(scanlines) > max_scanlines:
+        scanlines = scanlines[np.linspace(0, len(scanlines) - 1, max_scanlines).astype(int)]
+
+    p1 = polygon
+    p2 = np.roll(polygon, -1, axis=0)
+    best_point = None
+    best_width = 0.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for y in scanlines:
+            crossing = (np.minimum(p1[:, 1], p2[:, 1]) < y) & (np.maximum(p1[:, 1], p2[:, 1]) > y)
+            a = p1[crossing]
+            b = p2[crossing]
+            xs = np.sort(a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1]))
+
+            # Even-odd pairs of crossings bound the inside spans
+            widths = xs[1::2] - xs[0:-1:2]
+            if len(widths) == 0:
+                continue
+            k = np.argmax(widths)
+            if widths[k] > best_width:
+                best_width = widths[k]
+                best_point = ((xs[2 * k] + xs[2 * k + 1]) / 2, y)
+
+    return best_point
+
+def region_seeds(holes):
+    """Returns one triangle region per hole as [x, y, region id, max area].
+
+    Holes without an interior point are skipped, so their triangles stay mined.
+    A max area of 0 leaves the global area constraint in charge.
+    """
+    regions = []
+    for j, hole in enumerate(holes):
+        seed = polygon_interior_point(hole)
+        if seed is None:
+            print(f"Warning: no interior point found for {PILLAR_OUTPUT_FILENAME_START}{j + 1}")
+            continue
+        regions.append([seed[0], seed[1], j + 1, 0])
+    return regions
+
+def regions_from_attributes(mesh):
+    """Returns the region id of every triangle from triangle's region attributes."""
+    if 'triangle_attributes' not in mesh:
+        return np.full(len(mesh['triangles']), MINED_REGION_ID, dtype=np.int64)
+    return np.rint(mesh['triangle_attributes'][:, 0]).astype(np.int64)
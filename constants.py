@@ -16,4 +16,93 @@ PLOT_FILE_EXT = "plt"
 PILLAR_TEXT = "E_LT: 'PXXXXXXX';  'ELPLANE';  'SOLID';    ncp = 1; cf = 0.80;   "
 MINED_TEXT = "E_LT: 'MXXXXXXX';  'ELPLANE';  'MINED';    ncp = 1; cf = 0.80;   "
 
-PILLAR_NUMBERS_IMAGE = "PillarNumbers.png"
\ No newline at end of file
+PILLAR_NUMBERS_IMAGE = "PillarNumbers.png"
+
+# Element naming schemes, see mesh_writer.ElementNaming
+ELEMENT_NAMING_LEGACY = "legacy"  # 'PPNNNNN' and '1NNNNNN', the original 7 character names
+ELEMENT_NAMING_SHARDED = "sharded"  # Legacy names, mined elements split over M1 ... M9
+ELEMENT_NAMING_WIDE = "wide"  # 12 character names 'PPPPPNNNNNNN' and '1NNNNNNNNNNN'
+ELEMENT_NAMINGS = [ELEMENT_NAMING_LEGACY, ELEMENT_NAMING_SHARDED, ELEMENT_NAMING_WIDE]
+ELEMENT_NAMING = ELEMENT_NAMING_LEGACY
+
+# Image preview
+PREVIEW_DEBOUNCE_MS = 40  # Slider and resize events closer together than this are merged into one redraw
+PREVIEW_POLL_MS = 20  # How often the Tk loop checks for a finished preview render
+
+# Contours smaller than these (in pixels) are ignored when finding polygons, 0 keeps every contour
+MIN_CONTOUR_AREA = 0
+MIN_CONTOUR_PERIMETER = 0
+
+# Large images
+IMAGE_PYRAMID_MIN_PIXELS = 4 * 2**20  # From this size the preview is decoded at reduced resolution
+TILED_EDGES_MIN_PIXELS = 64 * 2**20  # From this size edges are detected tile by tile
+EDGE_TILE_SIZE = 4096  # Pixels per tile side
+EDGE_TILE_OVERLAP = 64  # Extra pixels around each tile so edges match across tile seams
+
+# Mesh plot
+PLOT_MAX_VISIBLE_EDGES = 300000  # Triangle edges are drawn once the view holds at most this many, otherwise only outlines
+PLOT_MINED_COLOR = "gray"  # Triangles of the mined area, edges shared with a pillar take the pillar colour
+PLOT_PILLAR_COLOR = "blue"
+
+# Region id given to triangles that are not inside any pillar
+MINED_REGION_ID = 0
+
+# Pillar classification modes for the mesher
+CLASSIFY_BY_CENTROID = "centroid"  # Point-in-polygon test of every triangle centroid
+CLASSIFY_BY_REGION = "region"  # Region attributes assigned by triangle from one seed per pillar
+CLASSIFICATION_MODE = CLASSIFY_BY_CENTROID
+
+# Output writing
+WRITE_CHUNK_SIZE = 50000  # Triangles classified and formatted per chunk, bounds the memory held per chunk
+WRITE_BUFFER_SIZE = 1 << 20  # Bytes buffered per open output file
+WRITE_MESH_SIDECAR = False  # Also write each element file's coordinates as a binary .npy sidecar
+MESH_SIDECAR_EXT = "npy"
+ELEMENT_PARSE_CHUNK_LINES = 100000  # Element lines converted per bulk parse when reading .tri files
+OUTPUT_EXECUTOR_THREAD = "thread"
+OUTPUT_EXECUTOR_PROCESS = "process"
+OUTPUT_EXECUTOR = OUTPUT_EXECUTOR_PROCESS  # Pool used to format output blocks
+OUTPUT_WORKERS = None  # None uses one worker per CPU core up to MAX_OUTPUT_WORKERS, 1 formats on the calling thread
+MAX_OUTPUT_WORKERS = 8
+PARALLEL_OUTPUT_MIN_TRIANGLES = 200000  # Smaller meshes are formatted on the calling thread
+# Maximum number of edges meeting at one mesh vertex
+MAX_EDGES_PER_VERTEX = 10
+
+# Mesh cache stored in the project's Data folder
+CACHE_FOLDER_NAME = "Cache"
+MESH_CACHE_EXT = "npz"
+MESH_CACHE_OUTPUT_STAMP = "output.key"  # Key of the mesh currently in the Mesh and Plot folders
+MESH_CACHE_LAST_RUN = "last_run.state"  # Input of the mesh currently in the Mesh and Plot folders
+MESH_CACHE_MAX_BYTES = 512 * 2**20
+MESH_CACHE_VERSION = 2  # Bump when the cached arrays or the output format change
+
+# Incremental re-meshing of edited pillars
+INCREMENTAL_MESHING = False  # Off by default: a patched mesh numbers its elements differently from a full run
+INCREMENTAL_MAX_CHANGED_FRACTION = 0.25  # Re-mesh everything when more pillars than this changed
+INCREMENTAL_MAX_PATCH_FRACTION = 0.5  # Re-mesh everything when the patch would cover more triangles than this
+
+# Tiled meshing
+MESH_TILES = 1  # Strips triangulated in parallel, 1 meshes the whole border in one triangle call
+
+# Meshing stages timed by the mesher, in pipeline order
+MESH_STAGES = ("read", "triangulate", "classify", "write", "export")
+
+# Run metrics
+WRITE_RUN_LOG = False  # Append the stage metrics of every run to Data/RUN_LOG_FILE_NAME
+RUN_LOG_FILE_NAME = "mesh_runs.jsonl"
+TRACE_MEMORY = False  # Measure each stage's peak memory with tracemalloc, which slows meshing down
+PROFILE_MESHING = False  # Profile runs with cProfile
+PROFILE_MIN_SECONDS = 10.0  # Profiles of faster runs are not saved
+PROFILE_FILE_NAME = "mesh_profile.prof"
+
+# Indexed mesh export to Data/Export
+EXPORT_FOLDER_NAME = "Export"
+EXPORT_FILE_NAME = "mesh"
+EXPORT_FORMAT_NPZ = "npz"  # NumPy archive: vertices, triangles, region_ids, region_offsets
+EXPORT_FORMAT_VTK = "vtk"  # Binary legacy VTK unstructured grid
+EXPORT_FORMAT_GMSH = "msh"  # Gmsh 2.2 ASCII
+EXPORT_FORMATS = (EXPORT_FORMAT_NPZ, EXPORT_FORMAT_VTK, EXPORT_FORMAT_GMSH)
+
+# Batch meshing
+BATCH_MEMORY_FRACTION = 0.75  # Share of available memory the running jobs may use
+BATCH_JOB_BASE_MEMORY = 200 * 2**20  # Interpreter, NumPy and triangle per worker process
+MESH_BYTES_PER_TRIANGLE = 600  # Peak bytes per triangle while meshing and writing
@@ -0,0 +1,217 @@
+import threading
+import numpy as np
+import cv2
+from constants import *
+
+class ImageAnalyzer:
+    """Staged polygon detection and preview scaling for one ImageSource.
+
+    The edge and contour stage only depends on the image, so it runs once per
+    loaded image and is kept until set_source is called again. Large images are
+    edge-detected in overlapping tiles into one full resolution edge mask. Slider changes only
+    re-run the approximation and minimum distance filter on the cached contours.
+    The polygon methods may be called from the preview worker and the Tk thread.
+    """
+
+    def __init__(self, source=None, canny_threshold1=50, canny_threshold2=150, min_contour_area=MIN_CONTOUR_AREA, min_contour_perimeter=MIN_CONTOUR_PERIMETER):
+        self.canny_threshold1 = canny_threshold1
+        self.canny_threshold2 = canny_threshold2
+        self.min_contour_area = min_contour_area
+        self.min_contour_perimeter = min_contour_perimeter
+        self.lock = threading.RLock()
+        self.set_source(source)
+
+    def set_source(self, source):
+        """Replaces the analysed image and drops every cached stage."""
+        self.source = source
+        self._contours = None
+        self._arc_lengths = None
+        self._polygons_key = None
+        self._polygons = None
+        self._layout_contours = None
+        self._layout_key = None
+        self._layout = None
+        self._display_key = None
+        self._display_image = None
+
+    def display_image(self, width, height):
+        """Returns the image scaled to fit width x height and the scale used.
+
+        Only the last size is cached, which is all a preview redrawn on slider moves needs.
+        """
+        if self._display_key != (width, height):
+            self._display_image = self.source.fit(width, height)
+            self._display_key = (width, height)
+        return self._display_image
+
+    def edges(self):
+        """Returns the cleaned up edge mask the contours are traced on, at full resolution."""
+        gray = self.source.gray()
+        if gray.size < TILED_EDGES_MIN_PIXELS:
+            return detect_edges(gray, self.canny_threshold1, self.canny_threshold2)
+
+        # Every tile is processed with a margin of overlap and only its own part is kept, so
+        # edges crossing tile seams join up in the mask and findContours traces them as one
+        height, width = gray.shape
+        edges = np.empty_like(gray)
+        for y in range(0, height, EDGE_TILE_SIZE):
+            for x in range(0, width, EDGE_TILE_SIZE):
+                top, left = max(0, y - EDGE_TILE_OVERLAP), max(0, x - EDGE_TILE_OVERLAP)
+                bottom, right = min(height, y + EDGE_TILE_SIZE + EDGE_TILE_OVERLAP), min(width, x + EDGE_TILE_SIZE + EDGE_TILE_OVERLAP)
+                tile = detect_edges(gray[top:bottom, left:right], self.canny_threshold1, self.canny_threshold2)
+                edges[y:y + EDGE_TILE_SIZE, x:x + EDGE_TILE_SIZE] = tile[y - top:y - top + EDGE_TILE_SIZE, x - left:x - left + EDGE_TILE_SIZE]
+        return edges
+
+    def filter_contours(self, contours):
+        """Returns the contours that pass the area and perimeter limits, with their arc lengths."""
+        arc_lengths = [cv2.arcLength(contour, True) for contour in contours]
+        if self.min_contour_area > 0 or self.min_contour_perimeter > 0:
+            kept = [i for i, contour in enumerate(contours) if arc_lengths[i] >= self.min_contour_perimeter and cv2.contourArea(contour) >= self.min_contour_area]
+            contours = [contours[i] for i in kept]
+            arc_lengths = [arc_lengths[i] for i in kept]
+        return contours, arc_lengths
+
+    def contours(self):
+        """Returns the external contours of the image, computed once per image."""
+        with self.lock:
+            if self._contours is None:
+                contours, _ = cv2.findContours(self.edges(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+                # Small contours (noise, text) are dropped once here instead of on every slider move
+                self._contours, self._arc_lengths = self.filter_contours(contours)
+            return self._contours
+
+    def layout_contours(self):
+        """Returns (border, pillars) contours of a combined layout image, computed once per image.
+
+        The border is the largest outermost contour. Traced edges are strokes with an outer
+        and an inner contour, so the pillars are the contours two levels below the border
+        (inside the inner side of the border stroke), or one level below when there are none.
+        Each entry is a (contours, arc_lengths) pair; the border one is empty if nothing was found.
+        """
+        with self.lock:
+            if self._layout_contours is None:
+                contours, hierarchy = cv2.findContours(self.edges(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+                border, pillars = [], []
+                if len(contours):
+                    hierarchy = hierarchy[0]
+                    top_level = [i for i in range(len(contours)) if hierarchy[i][3] < 0]
+                    border_id = max(top_level, key=lambda i: cv2.contourArea(contours[i]))
+                    border = [contours[border_id]]
+
+                    depth_one = child_contours(hierarchy, border_id)
+                    depth_two = [grandchild for child in depth_one for grandchild in child_contours(hierarchy, child)]
+                    pillars = [contours[i] for i in (depth_two or depth_one)]
+
+                border_lengths = [cv2.arcLength(contour, True) for contour in border]
+                self._layout_contours = ((border, border_lengths), self.filter_contours(pillars))
+            return self._layout_contours
+
+    def polygons(self, epsilon_factor=0.01, min_vertex_distance=0):
+        """Returns the approximated polygons as PackedPolygons for the given slider values."""
+        key = (epsilon_factor, min_vertex_distance)
+        with self.lock:
+            if self._polygons_key != key:
+                self._polygons = approximate_polygons(self.contours(), self._arc_lengths, epsilon_factor, min_vertex_distance)
+                self._polygons_key = key
+            return self._polygons
+
+    def layout_polygons(self, epsilon_factor=0.01, min_vertex_distance=0):
+        """Returns the (border, pillars) PackedPolygons of a combined layout image for the given slider values."""
+        key = (epsilon_factor, min_vertex_distance)
+        with self.lock:
+            if self._layout_key != key:
+                self._layout = tuple(approximate_polygons(contours, arc_lengths, epsilon_factor, min_vertex_distance) for contours, arc_lengths in self.layout_contours())
+                self._layout_key = key
+            return self._layout
+
+def detect_edges(gray, canny_threshold1, canny_threshold2):
+    """Blurs a grayscale image, finds its Canny edges and closes small gaps in them."""
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blurred, canny_threshold1, canny_threshold2)
+
+    kernel = np.ones((3, 3), np.uint8)
+    edges = cv2.dilate(edges, kernel, iterations=1)
+    edges = cv2.erode(edges, kernel, iterations=1)
+    return edges
+
+def child_contours(hierarchy, parent):
+    """Returns the ids of the direct children of a contour in a findContours hierarchy."""
+    children = []
+    child = hierarchy[parent][2]
+    while child >= 0:
+        children.append(child)
+        child = hierarchy[child][0]
+    return children
+
+def approximate_polygons(contours, arc_lengths, epsilon_factor, min_vertex_distance):
+    """Approximates every contour with approxPolyDP and applies the minimum vertex distance filter."""
+    approximations = [cv2.approxPolyDP(contour, epsilon_factor * arc_length, True).reshape(-1, 2) for contour, arc_length in zip(contours, arc_lengths)]
+    if not approximations:
+        return PackedPolygons()
+    vertices = np.concatenate(approximations)
+    offsets = np.cumsum([0] + [len(approx) for approx in approximations])
+
+    # Filter vertices based on minimum distance, then close the gaps left by dropped vertices
+    keep = filter_min_distance(vertices, offsets, min_vertex_distance)
+    offsets = np.concatenate([[0], np.cumsum(keep)])[offsets]
+    return PackedPolygons(vertices[keep], offsets)
+
+class PackedPolygons:
+    """Polygons stored as one (n, 2) vertex array plus offsets, polygon i being vertices[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, vertices=None, offsets=None):
+        self.vertices = np.empty((0, 2), dtype=np.int32) if vertices is None else vertices
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def centroids(self):
+        """Returns the mean vertex of every polygon."""
+        counts = np.diff(self.offsets)
+        sums = np.add.reduceat(self.vertices.astype(np.float64), self.offsets[:-1], axis=0) if len(self.vertices) else np.empty((0, 2))
+        return sums / counts[:, None]
+
+def filter_min_distance(vertices, offsets, min_distance):
+    """Returns a mask of the vertices to keep: the first vertex of every polygon and every
+    vertex further than min_distance from the last kept vertex of its polygon.
+
+    The rule is sequential, so polygons that need it are walked in lockstep, one vertex
+    position per step for all of them at once.
+    """
+    keep = np.ones(len(vertices), dtype=bool)
+    counts = np.diff(offsets)
+    if len(vertices) == 0:
+        return keep
+
+    # Until a polygon has a step of min_distance or less, every vertex is kept
+    steps = np.zeros(len(vertices))
+    steps[1:] = np.linalg.norm(np.diff(vertices, axis=0), axis=1)
+    short = steps <= min_distance
+    short[offsets[:-1][counts > 0]] = False
+    if not short.any():
+        return keep
+
+    # Walk each affected polygon from its first short step on
+    polygon_ids = np.repeat(np.arange(len(counts)), counts)
+    short_ids = np.flatnonzero(short)
+    affected, first = np.unique(polygon_ids[short_ids], return_index=True)
+    current = short_ids[first]
+    end = offsets[affected + 1]
+    last_kept = vertices[current - 1]
+    while len(current):
+        kept = np.linalg.norm(vertices[current] - last_kept, axis=1) > min_distance
+        keep[current] = kept
+        last_kept[kept] = vertices[current[kept]]
+        current = current + 1
+        active = current < end
+        current, end, last_kept = current[active], end[active], last_kept[active]
+    return keep
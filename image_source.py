@@ -0,0 +1,84 @@
+import cv2
+from PIL import Image
+from constants import *
+
+# Layout scans are decoded by OpenCV, PIL only reads their headers and must not refuse large ones
+Image.MAX_IMAGE_PIXELS = None
+
+# EXIF orientations of JPEG files that turn the image by 90 degrees, which OpenCV applies while decoding
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Decode flags for the reduced resolution levels of an image, by reduction factor
+REDUCED_COLOR_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+class ImageSource:
+    """An image file decoded on demand instead of kept as one full colour array.
+
+    Polygon detection only needs the full resolution grayscale image (a third of the
+    colour image's memory). The preview uses colour copies decoded at 1/2, 1/4 or 1/8
+    of the resolution, and the full resolution colour image is only decoded again
+    when an annotated copy is saved. The size is read from the file header.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._gray = None
+        self._shape = None
+        self._levels = {}
+
+    def color(self):
+        """Returns the full resolution colour image. Not cached."""
+        image = cv2.imread(self.path)
+        if image is None:
+            raise ValueError(f"Could not read the image {self.path}")
+        return image
+
+    def gray(self):
+        """Returns the full resolution grayscale image, decoded once."""
+        if self._gray is None:
+            image = cv2.imread(self.path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise ValueError(f"Could not read the image {self.path}")
+            self._gray = image
+        return self._gray
+
+    @property
+    def shape(self):
+        """(height, width) of the full resolution image, as OpenCV decodes it."""
+        if self._shape is None:
+            if self._gray is not None:
+                self._shape = self._gray.shape[:2]
+            else:
+                # PIL only parses the header until the pixels are accessed
+                try:
+                    with Image.open(self.path) as image:
+                        width, height = image.size
+                        if image.format == "JPEG" and image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                            width, height = height, width
+                except OSError:
+                    raise ValueError(f"Could not read the image {self.path}")
+                self._shape = (height, width)
+        return self._shape
+
+    def reduced(self, factor):
+        """Returns the colour image decoded at 1/factor of its resolution, for factor 1, 2, 4 or 8."""
+        if factor not in self._levels:
+            image = cv2.imread(self.path, REDUCED_COLOR_FLAGS[factor])
+            if image is None:
+                raise ValueError(f"Could not read the image {self.path}")
+            self._levels[factor] = image
+        return self._levels[factor]
+
+    def fit(self, width, height):
+        """Returns the image scaled to fit width x height, resized from the smallest level that is still large enough, and the scale relative to full resolution."""
+        h, w = self.shape
+        scale = min(width / w, height / h)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+
+        factor = 1
+        while factor < max(REDUCED_COLOR_FLAGS) and scale * factor * 2 <= 1 and w * h >= IMAGE_PYRAMID_MIN_PIXELS:
+            factor *= 2
+        level = self.reduced(factor)
+
+        interpolation = cv2.INTER_AREA if size[0] < level.shape[1] else cv2.INTER_LINEAR
+        return cv2.resize(level, size, interpolation=interpolation), scale
@@ -0,0 +1,158 @@
+import numpy as np
+import triangle
+from classification import classify_triangles, triangle_centroids
+from constants import *
+
+# Incremental re-meshing: only the neighbourhood of edited pillars is triangulated again.
+# The triangles of the previous mesh around the changed pillars are cut out, the hole is
+# re-triangulated with its boundary edges fixed (triangle's Y switch keeps them unsplit, so
+# the patch conforms to the kept mesh) and the patch triangles are appended after the kept ones.
+
+def diff_pillars(old_holes, new_holes):
+    """Returns the 0-based ids of the pillars that were added, removed or edited."""
+    changed = []
+    for j in range(max(len(old_holes), len(new_holes))):
+        if j >= len(old_holes) or j >= len(new_holes) or not np.array_equal(old_holes[j], new_holes[j]):
+            changed.append(j)
+    return changed
+
+def target_edge_length(max_area):
+    """Side of an equilateral triangle with area max_area."""
+    return np.sqrt(4 * max_area / np.sqrt(3))
+
+def triangle_areas(vertices, triangles):
+    a, b, c = vertices[triangles[:, 0]], vertices[triangles[:, 1]], vertices[triangles[:, 2]]
+    return 0.5 * np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+
+def edge_neighbours(triangles):
+    """Returns a (n, 3) array with the triangle across edge k (t[k], t[k + 1]) of every triangle, -1 on the boundary."""
+    edges = np.stack([triangles, np.roll(triangles, -1, axis=1)], axis=2).reshape(-1, 2)
+    edges.sort(axis=1)
+    keys = edges[:, 0] * (int(triangles.max()) + 1) + edges[:, 1]
+
+    order = np.argsort(keys, kind="stable")
+    shared = np.flatnonzero(keys[order][1:] == keys[order][:-1])
+    neighbours = np.full(len(edges), -1, dtype=np.int64)
+    neighbours[order[shared]] = order[shared + 1] // 3
+    neighbours[order[shared + 1]] = order[shared] // 3
+    return neighbours.reshape(-1, 3)
+
+def densify_polygon(polygon, spacing):
+    """Returns the polygon with extra vertices so no edge is longer than spacing."""
+    polygon = np.asarray(polygon, dtype=float)
+    following = np.roll(polygon, -1, axis=0)
+    lengths = np.linalg.norm(following - polygon, axis=1)
+    counts = np.maximum(1, np.ceil(lengths / spacing).astype(np.int64))
+
+    starts = np.repeat(polygon, counts, axis=0)
+    steps = np.repeat(following - polygon, counts, axis=0)
+    fractions = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / np.repeat(counts, counts)
+    return starts + steps * fractions[:, None]
+
+def remesh_changed_pillars(vertices, triangles, region_ids, old_holes, new_holes, max_area, index=None):
+    """Re-triangulates the neighbourhood of the pillars that differ between old_holes and new_holes.
+
+    Returns None when a full re-mesh is the better choice. Otherwise returns a dict with
+    the new vertices, triangles and region_ids, the set of region ids whose files changed
+    ("regions") and, for the mined group, how many leading elements kept their place
+    ("resume") and the ids of pillars that no longer exist ("obsolete").
+    """
+    changed = diff_pillars(old_holes, new_holes)
+    if not changed:
+        return None
+    if len(changed) > INCREMENTAL_MAX_CHANGED_FRACTION * max(len(new_holes), 1):
+        return None
+
+    spacing = target_edge_length(max_area)
+
+    # Boxes around the old and new outline of every changed pillar
+    boxes = []
+    for j in changed:
+        for holes in (old_holes, new_holes):
+            if j < len(holes) and len(holes[j]):
+                boxes.append(np.concatenate([holes[j].min(axis=0) - 2 * spacing, holes[j].max(axis=0) + 2 * spacing]))
+
+    # Cut out every triangle whose bounding box touches one of the boxes
+    corners = vertices[triangles]
+    low = corners.min(axis=1)
+    high = corners.max(axis=1)
+    removed = np.zeros(len(triangles), dtype=bool)
+    for box in boxes:
+        removed |= (low[:, 0] <= box[2]) & (high[:, 0] >= box[0]) & (low[:, 1] <= box[3]) & (high[:, 1] >= box[1])
+    if not removed.any() or removed.sum() > INCREMENTAL_MAX_PATCH_FRACTION * len(triangles):
+        return None
+
+    # Edges of the cut-out triangles that must survive as segments: the boundary of the
+    # hole and the outlines of unchanged pillars running through it
+    changed_ids = np.array([j + 1 for j in changed])
+    neighbours = edge_neighbours(triangles)[removed]
+    own = np.repeat(region_ids[removed], 3)
+    other = np.where(neighbours.ravel() >= 0, region_ids[np.maximum(neighbours.ravel(), 0)], MINED_REGION_ID)
+    other_removed = (neighbours.ravel() >= 0) & removed[np.maximum(neighbours.ravel(), 0)]
+    kept_outline = ((own != MINED_REGION_ID) & ~np.isin(own, changed_ids)) | ((other != MINED_REGION_ID) & ~np.isin(other, changed_ids))
+    keep_edge = ~other_removed | ((own != other) & kept_outline)
+
+    removed_triangles = triangles[removed]
+    edges = np.stack([removed_triangles, np.roll(removed_triangles, -1, axis=1)], axis=2).reshape(-1, 2)[keep_edge]
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+
+    # Centroids of the kept triangles bordering the cut-out area become holes, so only the cut-out area is meshed
+    across = neighbours.ravel()[~other_removed & (neighbours.ravel() >= 0)]
+    hole_points = triangle_centroids(vertices, triangles[np.unique(across)])
+
+    # Assemble the patch PSLG from the old boundary vertices and the densified new outlines
+    old_ids, local_edges = np.unique(edges, return_inverse=True)
+    local_edges = local_edges.reshape(-1, 2)
+    patch_vertices = [vertices[old_ids]]
+    patch_segments = [local_edges]
+    offset = len(old_ids)
+    for j in changed:
+        if j < len(new_holes) and len(new_holes[j]) >= 3:
+            outline = densify_polygon(new_holes[j], spacing)
+            loop = np.arange(len(outline))
+            patch_vertices.append(outline)
+            patch_segments.append(np.column_stack([loop, np.roll(loop, -1)]) + offset)
+            offset += len(outline)
+
+    pslg = {'vertices': np.vstack(patch_vertices), 'segments': np.vstack(patch_segments)}
+    if len(hole_points):
+        pslg['holes'] = hole_points
+    patch = triangle.triangulate(pslg, f"pqa{max_area}Y")
+    if 'triangles' not in patch or len(patch['triangles']) == 0:
+        return None
+
+    # The patch must exactly refill the cut-out area, anything else means the hole leaked
+    removed_area = triangle_areas(vertices, removed_triangles).sum()
+    patch_area = triangle_areas(patch['vertices'], patch['triangles']).sum()
+    if not np.isclose(removed_area, patch_area, rtol=1e-9, atol=0):
+        return None
+
+    # Input boundary vertices keep their old ids, every other patch vertex is appended
+    num_inputs = len(old_ids)
+    vertex_map = np.concatenate([old_ids, len(vertices) + np.arange(len(patch['vertices']) - num_inputs)])
+    merged_vertices = np.vstack([vertices, patch['vertices'][num_inputs:]])
+    patch_triangles = vertex_map[patch['triangles']]
+    patch_ids = classify_triangles(merged_vertices, patch_triangles, new_holes, index)
+
+    merged_triangles = np.vstack([triangles[~removed], patch_triangles])
+    merged_ids = np.concatenate([region_ids[~removed], patch_ids])
+
+    # Files to rewrite: every region that lost or gained triangles plus the edited pillars
+    regions = set(np.unique(region_ids[removed]).tolist()) | set(np.unique(patch_ids).tolist()) | set(j + 1 for j in changed if j < len(new_holes))
+    regions = {region for region in regions if region <= len(new_holes)}
+
+    # Mined elements before the first removed one keep their numbers and lines
+    resume = {}
+    if MINED_REGION_ID in regions:
+        mined = region_ids == MINED_REGION_ID
+        first_removed = np.flatnonzero(mined & removed)
+        resume[MINED_REGION_ID] = int(mined[:first_removed[0]].sum()) if len(first_removed) else int(mined.sum())
+
+    return {
+        'vertices': merged_vertices,
+        'triangles': merged_triangles,
+        'region_ids': merged_ids,
+        'regions': regions,
+        'resume': resume,
+        'obsolete': list(range(len(new_holes) + 1, len(old_holes) + 1)),
+    }
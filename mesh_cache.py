@@ -0,0 +1,140 @@
+import hashlib
+import os
+import numpy as np
+from constants import *
+
+class MeshCache:
+    """Content-addressed store of triangulated and classified meshes inside a project.
+
+    Entries are keyed on a hash of the parsed border and pillar vertices plus the
+    triangulation switches, and hold the vertex, triangle and region id arrays as
+    one uncompressed .npz file. The least recently used entries are evicted once
+    the folder grows past max_bytes. The key of the mesh currently written to
+    Data/Mesh and Data/Plot is kept in a small stamp file so an unchanged re-run
+    can skip writing altogether.
+    """
+
+    def __init__(self, cache_dir, max_bytes=MESH_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(border, holes, *settings):
+        """Returns the hex digest identifying a mesh input and its settings."""
+        digest = hashlib.sha256()
+        digest.update(f"{MESH_CACHE_VERSION}|{len(holes)}|{'|'.join(map(str, settings))}".encode())
+        for polygon in [border] + list(holes):
+            polygon = np.ascontiguousarray(polygon, dtype=np.float64)
+            digest.update(np.int64(len(polygon)).tobytes())
+            digest.update(polygon.tobytes())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.{MESH_CACHE_EXT}")
+
+    def _stamp_path(self):
+        return os.path.join(self.cache_dir, MESH_CACHE_OUTPUT_STAMP)
+
+    def load(self, key):
+        """Returns the cached (vertices, triangles, region_ids) for key, or None on a miss."""
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as entry:
+                arrays = (entry["vertices"], entry["triangles"].astype(np.int64), entry["region_ids"].astype(np.int64))
+        except (OSError, KeyError, ValueError):
+            os.remove(path)  # Damaged entries are treated as misses
+            return None
+
+        os.utime(path)  # Mark as recently used
+        return arrays
+
+    def store(self, key, vertices, triangles, region_ids):
+        """Saves a mesh under key and evicts old entries beyond the size limit."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write to a temporary name first so an interrupted run never leaves a partial entry
+        path = self._entry_path(key)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(
+                file,
+                vertices=np.asarray(vertices, dtype=np.float64),
+                triangles=np.asarray(triangles, dtype=np.int32 if len(vertices) < 2**31 else np.int64),
+                region_ids=np.asarray(region_ids, dtype=np.int32),
+            )
+        os.replace(temp_path, path)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        if not os.path.exists(self.cache_dir):
+            return
+
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.is_file() and entry.name.endswith(f".{MESH_CACHE_EXT}"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self._entry_path(keep):
+                continue
+            os.remove(path)
+            total -= size
+
+    def _run_path(self):
+        return os.path.join(self.cache_dir, MESH_CACHE_LAST_RUN)
+
+    def store_run(self, key, border, holes, settings):
+        """Remembers the input of the mesh last written, for incremental re-meshing."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        holes = [np.asarray(hole, dtype=np.float64).reshape(-1, 2) for hole in holes]
+        offsets = np.cumsum([0] + [len(hole) for hole in holes])
+
+        temp_path = f"{self._run_path()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(
+                file,
+                key=np.array(key),
+                settings=np.array(settings),
+                border=np.asarray(border, dtype=np.float64),
+                pillar_vertices=np.concatenate(holes) if holes else np.empty((0, 2)),
+                pillar_offsets=offsets,
+            )
+        os.replace(temp_path, self._run_path())
+
+    def load_run(self):
+        """Returns (key, settings, border, holes) of the mesh last written, or None."""
+        try:
+            with np.load(self._run_path()) as run:
+                offsets = run["pillar_offsets"]
+                vertices = run["pillar_vertices"]
+                holes = [vertices[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                return str(run["key"]), str(run["settings"]), run["border"], holes
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def output_key(self):
+        """Returns the key of the mesh last written completely to the output folders."""
+        try:
+            with open(self._stamp_path(), "r") as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def set_output_key(self, key):
+        """Records which mesh the output folders hold. None marks them as unknown."""
+        if key is None:
+            if os.path.exists(self._stamp_path()):
+                os.remove(self._stamp_path())
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._stamp_path(), "w") as file:
+            file.write(key)
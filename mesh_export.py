@@ -0,0 +1,103 @@
+import os
+import numpy as np
+from constants import *
+
+# Indexed mesh export: one shared vertex table plus triangle connectivity grouped by region,
+# so file size follows the number of vertices instead of three coordinates per triangle.
+
+def compact_mesh(vertices, triangles, region_ids, num_pillars):
+    """Returns the mesh with unused vertices dropped and triangles sorted by region.
+
+    Also returns region_offsets: the triangles of region r (0 for the mined area, n
+    for pillar P{n}) are triangles[region_offsets[r]:region_offsets[r + 1]], in the
+    same order as the elements of their output file.
+    """
+    used, triangles = np.unique(np.asarray(triangles), return_inverse=True)
+    triangles = triangles.reshape(-1, 3)
+    region_ids = np.asarray(region_ids)
+
+    order = np.argsort(region_ids, kind="stable")
+    region_offsets = np.searchsorted(region_ids[order], np.arange(num_pillars + 2))
+    return np.asarray(vertices)[used], triangles[order], region_ids[order], region_offsets
+
+def region_names(num_pillars):
+    return [f"{MINED_OUTPUT_FILENAME_START}1"] + [f"{PILLAR_OUTPUT_FILENAME_START}{i + 1}" for i in range(num_pillars)]
+
+def export_npz(path, vertices, triangles, region_ids, region_offsets):
+    """Writes the indexed mesh as an uncompressed NumPy .npz archive."""
+    index_type = np.int32 if len(vertices) < 2**31 else np.int64
+    with open(path, "wb") as file:
+        np.savez(
+            file,
+            vertices=np.asarray(vertices, dtype=np.float64),
+            triangles=triangles.astype(index_type),
+            region_ids=region_ids.astype(np.int32),
+            region_offsets=region_offsets.astype(np.int64),
+            region_names=np.array(region_names(len(region_offsets) - 2)),
+        )
+
+def export_vtk(path, vertices, triangles, region_ids, region_offsets):
+    """Writes the indexed mesh as a binary legacy VTK unstructured grid with a region id per cell."""
+    points = np.column_stack([vertices, np.zeros(len(vertices))]).astype(">f8")
+    cells = np.column_stack([np.full(len(triangles), 3), triangles]).astype(">i4")
+    with open(path, "wb") as file:
+        file.write(b"# vtk DataFile Version 3.0\nPolyMesh mesh\nBINARY\nDATASET UNSTRUCTURED_GRID\n")
+        file.write(f"POINTS {len(points)} double\n".encode())
+        file.write(points.tobytes())
+        file.write(f"\nCELLS {len(cells)} {cells.size}\n".encode())
+        file.write(cells.tobytes())
+        file.write(f"\nCELL_TYPES {len(cells)}\n".encode())
+        file.write(np.full(len(cells), 5, dtype=">i4").tobytes())  # 5 is VTK_TRIANGLE
+        file.write(f"\nCELL_DATA {len(cells)}\nSCALARS region_id int 1\nLOOKUP_TABLE default\n".encode())
+        file.write(region_ids.astype(">i4").tobytes())
+        file.write(b"\n")
+
+def export_gmsh(path, vertices, triangles, region_ids, region_offsets, chunk_size=WRITE_CHUNK_SIZE):
+    """Writes the indexed mesh in the Gmsh 2.2 ASCII format, one physical group per region."""
+    num_pillars = len(region_offsets) - 2
+    with open(path, "w", buffering=WRITE_BUFFER_SIZE) as file:
+        file.write("$MeshFormat\n2.2 0 8\n$EndMeshFormat\n")
+
+        # Physical group region_id + 1 for every region, as Gmsh reserves 0
+        file.write(f"$PhysicalNames\n{num_pillars + 1}\n")
+        for region_id, name in enumerate(region_names(num_pillars)):
+            file.write(f'2 {region_id + 1} "{name}"\n')
+        file.write("$EndPhysicalNames\n")
+
+        file.write(f"$Nodes\n{len(vertices)}\n")
+        for start in range(0, len(vertices), chunk_size):
+            block = vertices[start:start + chunk_size]
+            values = np.column_stack([np.arange(start + 1, start + len(block) + 1), block])
+            file.write(("%d %.17g %.17g 0\n" * len(block)) % tuple(values.ravel().tolist()))
+        file.write("$EndNodes\n")
+
+        file.write(f"$Elements\n{len(triangles)}\n")
+        for start in range(0, len(triangles), chunk_size):
+            block = triangles[start:start + chunk_size] + 1
+            groups = region_ids[start:start + chunk_size] + 1
+            values = np.column_stack([np.arange(start + 1, start + len(block) + 1), groups, groups, block])
+            file.write(("%d 2 2 %d %d %d %d %d\n" * len(block)) % tuple(values.ravel().tolist()))
+        file.write("$EndElements\n")
+
+EXPORTERS = {
+    EXPORT_FORMAT_NPZ: export_npz,
+    EXPORT_FORMAT_VTK: export_vtk,
+    EXPORT_FORMAT_GMSH: export_gmsh,
+}
+
+def export_mesh(export_dir, formats, vertices, triangles, region_ids, num_pillars):
+    """Writes the mesh in every requested format to export_dir and returns the file paths."""
+    os.makedirs(export_dir, exist_ok=True)
+    mesh = compact_mesh(vertices, triangles, region_ids, num_pillars)
+
+    paths = []
+    for export_format in formats:
+        if export_format not in EXPORTERS:
+            raise ValueError(f"Unknown export format: {export_format}")
+
+        # Written under a temporary name so a failed export never leaves a partial file
+        path = os.path.join(export_dir, f"{EXPORT_FILE_NAME}.{export_format}")
+        EXPORTERS[export_format](f"{path}.tmp", *mesh)
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+    return paths
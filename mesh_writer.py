@@ -0,0 +1,407 @@
+import os
+import queue
+import multiprocessing
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from constants import *
+
+# printf-style record layouts, byte-identical to the per-triangle f-strings they replace
+COORDINATE_FORMAT = "%.4f %.4f %.4f %.4f %.4f %.4f\n"
+PLOT_FORMAT = "%.4f %.4f\n%.4f %.4f\n%.4f %.4f\n%.4f %.4f\n\n"
+PLOT_LINES_PER_TRIANGLE = 5
+
+def element_format(template, name_format):
+    """Returns the printf format of one element record for an element text template."""
+    return template.replace("%", "%%").replace("XXXXXXX", name_format) + COORDINATE_FORMAT
+
+class ElementNaming:
+    """Element names and mined file names of one naming scheme.
+
+    Every scheme names pillar elements from the pillar number and the element
+    number, and mined elements from the mined file number and the element number:
+      legacy:  7 characters, 'PPNNNNN' and '1NNNNNN' (99 pillars, 99,999 elements
+               per pillar, 999,999 mined elements).
+      sharded: legacy names, but mined elements continue in M2 ... M9 with names
+               '2NNNNNN' ... '9NNNNNN' (8,999,991 mined elements).
+      wide:    12 characters, 'PPPPPNNNNNNN' and '1NNNNNNNNNNN' (99,999 pillars,
+               9,999,999 elements per pillar, 99,999,999,999 mined elements).
+    """
+
+    def __init__(self, scheme=ELEMENT_NAMING):
+        if scheme == ELEMENT_NAMING_LEGACY:
+            pillar_digits, number_digits, mined_digits, mined_files = 2, 5, 6, 1
+        elif scheme == ELEMENT_NAMING_SHARDED:
+            pillar_digits, number_digits, mined_digits, mined_files = 2, 5, 6, 9
+        elif scheme == ELEMENT_NAMING_WIDE:
+            pillar_digits, number_digits, mined_digits, mined_files = 5, 7, 11, 1
+        else:
+            raise ValueError(f"Unknown element naming scheme: {scheme}")
+
+        self.scheme = scheme
+        self.name_length = pillar_digits + number_digits
+        self.max_pillars = 10**pillar_digits - 1
+        self.max_pillar_elements = 10**number_digits - 1
+        self.max_mined_elements = 10**mined_digits - 1  # Per mined file
+        self.max_mined_files = mined_files
+        self.pillar_format = element_format(PILLAR_TEXT, f"%0{pillar_digits}d%0{number_digits}d")
+        self.mined_formats = [element_format(MINED_TEXT, f"{k}%0{mined_digits}d") for k in range(1, mined_files + 1)]
+
+    def mined_files(self, num_mined):
+        """Returns how many mined files num_mined elements need."""
+        return max(1, -(-num_mined // self.max_mined_elements))
+
+    def check_pillars(self, num_pillars):
+        """Raises ValueError if the pillar numbers of num_pillars pillars would overflow, known before meshing."""
+        if num_pillars > self.max_pillars:
+            hint = f", use the {ELEMENT_NAMING_WIDE} naming" if self.scheme != ELEMENT_NAMING_WIDE else ""
+            raise ValueError(f"{num_pillars} pillars exceed the {self.max_pillars} of the {self.scheme} element naming{hint}")
+
+    def check(self, group_sizes):
+        """Raises ValueError if the element names of a mesh with these region sizes would overflow."""
+        num_pillars = len(group_sizes) - 1
+        hint = f", use the {ELEMENT_NAMING_WIDE} naming" if self.scheme != ELEMENT_NAMING_WIDE else ""
+        self.check_pillars(num_pillars)
+        if num_pillars and group_sizes[1:].max() > self.max_pillar_elements:
+            pillar = int(np.argmax(group_sizes[1:])) + 1
+            raise ValueError(f"Pillar {pillar} has {group_sizes[pillar]} elements, more than the {self.max_pillar_elements} of the {self.scheme} element naming{hint} or a larger max area")
+        if self.mined_files(group_sizes[MINED_REGION_ID]) > self.max_mined_files:
+            limit = self.max_mined_elements * self.max_mined_files
+            if self.scheme == ELEMENT_NAMING_LEGACY:
+                hint = f", use the {ELEMENT_NAMING_SHARDED} or {ELEMENT_NAMING_WIDE} naming"
+            raise ValueError(f"{group_sizes[MINED_REGION_ID]} mined elements exceed the {limit} of the {self.scheme} element naming{hint}")
+
+def naming_for_pillars(num_pillars, scheme=ELEMENT_NAMING):
+    """Returns scheme, or the wide naming when scheme cannot number num_pillars pillars."""
+    return scheme if num_pillars <= ElementNaming(scheme).max_pillars else ELEMENT_NAMING_WIDE
+
+# Record formats of the legacy naming
+PILLAR_ELEMENT_FORMAT = ElementNaming(ELEMENT_NAMING_LEGACY).pillar_format
+MINED_ELEMENT_FORMAT = ElementNaming(ELEMENT_NAMING_LEGACY).mined_formats[0]
+
+def format_elements(record_format, names, coords):
+    """Formats a block of element records with one printf call.
+
+    names is an (n, k) array of the integers in the element name and coords an
+    (n, 6) array of triangle coordinates.
+    """
+    values = np.hstack([names.astype(float), coords])
+    return (record_format * len(values)) % tuple(values.ravel().tolist())
+
+def format_plot_records(coords):
+    """Formats a block of closed triangle outlines for the .plt files."""
+    values = np.hstack([coords, coords[:, :2]])
+    return (PLOT_FORMAT * len(values)) % tuple(values.ravel().tolist())
+
+def truncate_records(path, records, lines_per_record):
+    """Cuts a text file right after its first `records` records of lines_per_record lines."""
+    remaining = records * lines_per_record
+    offset = 0
+    with open(path, "r+b") as file:
+        while remaining > 0:
+            chunk = file.read(1 << 20)
+            if not chunk:
+                raise ValueError(f"{path} has fewer than {records} records")
+
+            newlines = chunk.count(b"\n")
+            if newlines < remaining:
+                remaining -= newlines
+                offset += len(chunk)
+                continue
+
+            position = -1
+            for _ in range(remaining):
+                position = chunk.index(b"\n", position + 1)
+            offset += position + 1
+            remaining = 0
+        file.truncate(offset)
+
+def sidecar_path(element_path):
+    """Returns the path of the binary sidecar of an element file."""
+    return f"{os.path.splitext(element_path)[0]}.{MESH_SIDECAR_EXT}"
+
+def element_stamp(element_path):
+    """Returns the first row of a sidecar: the size and modification time of its element file."""
+    stat = os.stat(element_path)
+    return np.array([stat.st_size, stat.st_mtime, 0, 0, 0, 0], dtype=np.float64)
+
+def load_sidecar(element_path):
+    """Returns the memory-mapped (n, 6) triangle coordinates stored next to an element file.
+
+    The first row of a sidecar records the size and modification time of the element
+    file it was written for. Returns None when there is no sidecar or the element file
+    has changed since, as after a cancelled write or a file replaced by hand.
+    """
+    path = sidecar_path(element_path)
+    try:
+        coords = np.load(path, mmap_mode="r")
+        if coords.ndim != 2 or coords.shape[1] != 6 or len(coords) == 0:
+            return None
+        if not np.array_equal(coords[0], element_stamp(element_path)):
+            return None
+    except (OSError, ValueError):
+        return None
+    return coords[1:]
+
+def parse_element_coords(element_path, lines_per_chunk=ELEMENT_PARSE_CHUNK_LINES):
+    """Returns the (n, 6) triangle coordinates of an element file.
+
+    The coordinates follow the last ';' of every element line. They are cut out
+    as text and converted in bulk, a chunk of lines at a time.
+    """
+    blocks = []
+    with open(element_path, "r") as file:
+        while True:
+            lines = file.readlines(lines_per_chunk * 128)
+            if not lines:
+                break
+            text = " ".join([line[line.rindex(";") + 1:] for line in lines if line.startswith("E_LT:")])
+            blocks.append(np.fromstring(text, sep=" ") if text else np.empty(0))
+    return np.concatenate(blocks).reshape(-1, 6) if blocks else np.empty((0, 6))
+
+def format_block(record_format, names, coords):
+    """Returns the element and plot text of one block of triangles.
+
+    Module level so it can run in a worker process.
+    """
+    return format_elements(record_format, names, coords), format_plot_records(coords)
+
+class MeshWriter:
+    """Writes classified triangles to the P{n}/M1 element and plot files.
+
+    Triangles are grouped by region and every group is formatted in blocks of
+    chunk_size records instead of one write per triangle. Elements keep their
+    original relative order, so numbering matches the per-triangle writer.
+
+    Finished blocks are written in file order by a writer thread, so the next block
+    is formatted (on this thread, or on a thread or process pool with workers > 1)
+    while the previous one goes to disk. Only one element/plot file pair is open at
+    a time and at most max_pending blocks are in flight, so open descriptors and
+    buffered text stay bounded however many pillars and triangles there are.
+    """
+
+    def __init__(self, mesh_dir, plot_dir, chunk_size=WRITE_CHUNK_SIZE, workers=OUTPUT_WORKERS, executor=OUTPUT_EXECUTOR, naming=None):
+        self.mesh_dir = mesh_dir
+        self.plot_dir = plot_dir
+        self.naming = naming if naming is not None else ElementNaming()
+        self.bytes_written = 0  # Element, plot and sidecar bytes written by this writer
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else min(MAX_OUTPUT_WORKERS, os.cpu_count() or 1)
+        self.executor = executor
+        self.max_pending = 2 * max(self.workers, 1)
+
+    def prepare_folders(self):
+        """Creates the output folders, removing files left by a previous run."""
+        for folder in (self.mesh_dir, self.plot_dir):
+            if os.path.exists(folder):
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            os.remove(entry.path)
+            else:
+                os.makedirs(folder)
+
+    def output_paths(self, name):
+        return (os.path.join(self.mesh_dir, f"{name}.{ELEMENT_FILE_EXT}"), os.path.join(self.plot_dir, f"{name}.{PLOT_FILE_EXT}"))
+
+    def _remove_files(self, name):
+        element_path, plot_path = self.output_paths(name)
+        for path in (element_path, plot_path, sidecar_path(element_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def remove_outputs(self, region_ids):
+        """Deletes the element, plot and sidecar files of pillars that no longer exist."""
+        for region_id in region_ids:
+            self._remove_files(f"{PILLAR_OUTPUT_FILENAME_START}{region_id}")
+
+    def remove_unused_mined_files(self, mined_files):
+        """Deletes mined files beyond the first mined_files, left by a larger earlier mesh."""
+        for k in range(mined_files + 1, self.naming.max_mined_files + 1):
+            self._remove_files(f"{MINED_OUTPUT_FILENAME_START}{k}")
+
+    def output_names(self, num_pillars, mined_files=1):
+        return [f"{MINED_OUTPUT_FILENAME_START}{k}" for k in range(1, mined_files + 1)] + [f"{PILLAR_OUTPUT_FILENAME_START}{i + 1}" for i in range(num_pillars)]
+
+    def outputs_exist(self, num_pillars, mined_files=1):
+        """Returns True if every element and plot file of a mesh with num_pillars pillars exists."""
+        return all(os.path.exists(path) for name in self.output_names(num_pillars, mined_files) for path in self.output_paths(name))
+
+    def files(self, region_ids, num_pillars, regions=None, resume=None):
+        """Yields (file name, first element, record format, triangle ids) for every output file in order.
+
+        Only the groups in regions are produced (all when None). resume maps a region
+        id to the number of its leading elements that are already on disk; files made
+        up of those only are skipped and the ids start after them. Mined elements are
+        split over as many mined files as the naming needs, each numbered from 1.
+        """
+        region_ids = np.asarray(region_ids)
+        order = np.argsort(region_ids, kind="stable")
+        bounds = np.searchsorted(region_ids[order], np.arange(num_pillars + 2))
+        resume = resume or {}
+
+        # Every pillar gets its files even when no triangle falls inside it
+        for region_id in range(num_pillars + 1):
+            if regions is not None and region_id not in regions:
+                continue
+
+            group = order[bounds[region_id]:bounds[region_id + 1]]
+            skip = resume.get(region_id, 0)
+            if region_id != MINED_REGION_ID:
+                yield f"{PILLAR_OUTPUT_FILENAME_START}{region_id}", skip, self.naming.pillar_format, group[skip:]
+                continue
+
+            size = self.naming.max_mined_elements
+            for k in range(self.naming.mined_files(len(group))):
+                if skip >= (k + 1) * size:
+                    continue  # Mined file already complete on disk
+                first = max(skip - k * size, 0)
+                yield f"{MINED_OUTPUT_FILENAME_START}{k + 1}", first, self.naming.mined_formats[k], group[k * size + first:(k + 1) * size]
+
+    def blocks(self, vertices, triangles, region_ids, num_pillars, regions=None, resume=None):
+        """Yields (file name, first element, record format, names, coords) blocks in output order.
+
+        Element numbers are assigned here from each triangle's position within its
+        file, so they do not depend on which worker formats the block. regions and
+        resume select what is written, see files(). A file without triangles left
+        to write yields a single block with no coords.
+        """
+        for name, first, record_format, group in self.files(region_ids, num_pillars, regions, resume):
+            if len(group) == 0:
+                yield name, first, record_format, None, None
+
+            pillar = name.startswith(PILLAR_OUTPUT_FILENAME_START)
+            for start in range(0, len(group), self.chunk_size):
+                chunk = group[start:start + self.chunk_size]
+                numbers = np.arange(first + start + 1, first + start + len(chunk) + 1)
+                if pillar:
+                    names = np.column_stack([np.full(len(chunk), int(name[len(PILLAR_OUTPUT_FILENAME_START):])), numbers])
+                else:
+                    names = numbers[:, None]
+                yield name, first + start, record_format, names, vertices[triangles[chunk]].reshape(-1, 6)
+
+    def _open_outputs(self, name, first):
+        """Opens a group's element and plot files, keeping their first `first` records when resuming."""
+        element_path, plot_path = self.output_paths(name)
+        if first == 0:
+            return open(element_path, "w", buffering=WRITE_BUFFER_SIZE), open(plot_path, "w", buffering=WRITE_BUFFER_SIZE)
+
+        truncate_records(element_path, first, 1)
+        truncate_records(plot_path, first, PLOT_LINES_PER_TRIANGLE)
+        return open(element_path, "a", buffering=WRITE_BUFFER_SIZE), open(plot_path, "a", buffering=WRITE_BUFFER_SIZE)
+
+    def _create_executor(self, num_triangles):
+        # Pool start-up costs more than it saves on small meshes
+        if self.workers <= 1 or num_triangles < PARALLEL_OUTPUT_MIN_TRIANGLES:
+            return None
+        if self.executor == OUTPUT_EXECUTOR_PROCESS:
+            # Forking the threaded GUI (Tk, OpenCV) from its meshing thread can deadlock the children
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def write(self, vertices, triangles, region_ids, num_pillars, stop_event=None, progress=None, regions=None, resume=None):
+        """Writes the output files. Returns False if stop_event was set before finishing.
+
+        regions and resume restrict the write to some groups, see blocks().
+        """
+        group_sizes = np.bincount(np.asarray(region_ids), minlength=num_pillars + 1)
+        self.naming.check(group_sizes)
+        if regions is None or MINED_REGION_ID in regions:
+            self.remove_unused_mined_files(self.naming.mined_files(group_sizes[MINED_REGION_ID]))
+        if regions is not None:
+            group_sizes = group_sizes[sorted(regions)]
+        total = max(int(group_sizes.sum()) - sum((resume or {}).values()), 1)
+        written = 0
+        pending = queue.Queue(maxsize=self.max_pending)
+        stopped = threading.Event()
+        errors = []
+        executor = self._create_executor(len(triangles))
+
+        def write_blocks():
+            """Writer thread: writes queued blocks until the None sentinel, then closes the files."""
+            nonlocal written
+            open_name = None
+            open_files = ()
+            try:
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        return
+                    if stopped.is_set() or errors:
+                        continue  # Drain so the formatting thread never blocks on a full queue
+
+                    try:
+                        name, first, count, result = item
+                        if executor is not None and result is not None:
+                            result = result.result()
+
+                        if name != open_name:
+                            for f in open_files:
+                                f.close()
+                            open_files = ()
+                            open_files = self._open_outputs(name, first)
+                            open_name = name
+
+                        if result is not None:
+                            open_files[0].write(result[0])
+                            open_files[1].write(result[1])
+                            self.bytes_written += len(result[0]) + len(result[1])  # ASCII text
+
+                        written += count
+                        if progress is not None:
+                            progress(written / total)
+                    except BaseException as e:
+                        errors.append(e)
+            finally:
+                for f in open_files:
+                    f.close()
+
+        writer_thread = threading.Thread(target=write_blocks, daemon=True)
+        writer_thread.start()
+        try:
+            for name, first, record_format, names, coords in self.blocks(vertices, triangles, region_ids, num_pillars, regions, resume):
+                if (stop_event is not None and stop_event.is_set()) or errors:
+                    break
+
+                if coords is None:
+                    pending.put((name, first, 0, None))
+                elif executor is None:
+                    pending.put((name, first, len(coords), format_block(record_format, names, coords)))
+                else:
+                    pending.put((name, first, len(coords), executor.submit(format_block, record_format, names, coords)))
+        except BaseException:
+            stopped.set()
+            raise
+        finally:
+            # Blocks already queued are still written unless the run was cancelled
+            if stop_event is not None and stop_event.is_set():
+                stopped.set()
+            pending.put(None)
+            writer_thread.join()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if errors:
+            raise errors[0]
+        return not stopped.is_set()
+
+    def write_sidecars(self, vertices, triangles, region_ids, num_pillars, regions=None):
+        """Writes every group's triangle coordinates as an (n + 1, 6) float64 .npy file next to its element file.
+
+        The coordinates are the unrounded mesh values the text files are formatted
+        from, after a first row stamping the element file as written. The files are
+        filled a chunk at a time and renamed into place when complete.
+        """
+        for name, _, _, group in self.files(region_ids, num_pillars, regions):
+            element_path = self.output_paths(name)[0]
+            path = sidecar_path(element_path)
+            temp_path = f"{path}.tmp"
+            coords = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float64, shape=(len(group) + 1, 6))
+            coords[0] = element_stamp(element_path)
+            for start in range(0, len(group), self.chunk_size):
+                chunk = group[start:start + self.chunk_size]
+                coords[start + 1:start + 1 + len(chunk)] = vertices[triangles[chunk]].reshape(-1, 6)
+            coords.flush()
+            self.bytes_written += coords.nbytes
+            del coords  # Release the mapping before the rename, Windows cannot replace a mapped file
+            os.replace(temp_path, path)
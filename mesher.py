@@ -1,27 +1,58 @@
 import triangle
 import numpy as np
+import argparse
 import os
+import sys
+import cProfile
+from contextlib import contextmanager
+from classification import classify_triangles, region_seeds, regions_from_attributes
+from spatial_index import PolygonIndex
+from mesh_writer import MeshWriter, ElementNaming
+from valence import limit_valence
+from pslg import read_border_file, read_pillar_file, split_polygons, build_pslg
+from mesh_cache import MeshCache
+from incremental import diff_pillars, remesh_changed_pillars
+from tiling import triangulate_tiled
+from mesh_export import export_mesh
+from metrics import RunMetrics, append_run_log, format_stage
 from constants import *
 
 class Mesher:
-    def __init__(self, project_path):
+    def __init__(self, project_path, classification_mode=CLASSIFICATION_MODE, cross_check=False, output_workers=OUTPUT_WORKERS, use_cache=True, incremental=INCREMENTAL_MESHING, tiles=MESH_TILES, write_sidecar=WRITE_MESH_SIDECAR, export_formats=(), element_naming=ELEMENT_NAMING, run_log=WRITE_RUN_LOG, profile=PROFILE_MESHING, trace_memory=TRACE_MEMORY, chunk_size=WRITE_CHUNK_SIZE):
         self.triangles = 0
+        self.pillars = 0
         self.stop_thread = False
         self.project_path = project_path
+        self.classification_mode = classification_mode
+        self.cross_check = cross_check
+        self.output_workers = output_workers
+        self.use_cache = use_cache
+        self.incremental = incremental
+        self.tiles = tiles
+        self.write_sidecar = write_sidecar
+        self.export_formats = export_formats
+        self.element_naming = element_naming
+        self.run_log = run_log
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.chunk_size = chunk_size
+        self.stage_times = {}
+        self.metrics = RunMetrics()
+        self.pillar_index = None
+
+    # Context manager measuring one meshing stage in metrics and its wall time in stage_times
+    # Yields the stage's metrics dict, on which the stage can set 'triangles' and 'bytes'
+    @contextmanager
+    def stage(self, name):
+        try:
+            with self.metrics.stage(name) as record:
+                yield record
+        finally:
+            self.stage_times[name] = self.metrics.stages[name]['wall_time']
 
     # Function to read vertices from a file
     def read_vertices_from_file(self, filename):
-        vertices = []
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-            for line in lines:
-                if line.strip().startswith(MINED_OUTPUT_FILENAME_START) or line.strip().startswith(PILLAR_OUTPUT_FILENAME_START):
-                    continue
-                parts = line.strip().split()
-                if len(parts) == 2:
-                    x, y = map(float, parts)
-                    vertices.append([x, y])
-        return np.array(vertices)
+        return read_border_file(filename)
 
     # Function to check if a point is inside a given polygon
     def is_point_in_polygon(self, point, polygon):
@@ -40,201 +71,292 @@ class Mesher:
                             inside = not inside
             p1x, p1y = p2x, p2y
         return inside
+
+    # Function to find the pillar each triangle belongs to (MINED_REGION_ID if none)
+    # Returns None if stop_event was set while classifying by centroid
+    def classify_triangles(self, mesh, holes, index=None, stop_event=None, progress=None):
+        if self.classification_mode == CLASSIFY_BY_CENTROID:
+            return classify_triangles(mesh['vertices'], mesh['triangles'], holes, index, self.chunk_size, stop_event, progress)
+
+        if self.classification_mode != CLASSIFY_BY_REGION:
+            raise ValueError(f"Unknown classification mode: {self.classification_mode}")
+
+        # Tiled meshes carry no region attributes, their triangles are classified by centroid
+        if 'triangle_attributes' not in mesh:
+            return classify_triangles(mesh['vertices'], mesh['triangles'], holes, index, self.chunk_size, stop_event, progress)
+
+        region_ids = regions_from_attributes(mesh)
+        if self.cross_check:
+            centroid_ids = classify_triangles(mesh['vertices'], mesh['triangles'], holes, index)
+            mismatches = np.count_nonzero(region_ids != centroid_ids)
+            if mismatches:
+                print(f"Warning: region attributes disagree with the centroid test for {mismatches} triangles")
+            else:
+                print("Region attributes match the centroid test")
+        return region_ids
   
-    def enforce_edge_constraint(self, mesh, max_edges=10):
-        # Create adjacency list to count edges per vertex
-        vertex_edges = {i: set() for i in range(len(mesh['vertices']))}
-        for triangle_indices in mesh['triangles']:
-            for i, j in zip(triangle_indices, np.roll(triangle_indices, -1)):
-                vertex_edges[i].add(j)
-                vertex_edges[j].add(i)
+    def enforce_edge_constraint(self, mesh, max_edges=MAX_EDGES_PER_VERTEX):
+        # Flip edges away from vertices with too many edges; segments and region borders stay put
+        triangles, remaining = limit_valence(mesh['vertices'], mesh['triangles'], max_edges, mesh.get('segments'), mesh.get('triangle_attributes'))
+        mesh['triangles'] = triangles
+        if remaining:
+            print(f"Warning: {remaining} vertices still have more than {max_edges} edges")
+        return mesh
 
-        # Identify vertices exceeding the max_edges limit
-        excess_vertices = {v for v, edges in vertex_edges.items() if len(edges) > max_edges}
+    # Key of the output folders holding the mesh of cache_key with the files this mesher writes
+    # Sidecars are optional, so folders written without them do not count as up to date
+    def output_key(self, cache_key):
+        return f"{cache_key}|sidecar" if self.write_sidecar else cache_key
 
-        if not excess_vertices:
-            return mesh  # No changes needed
+    # Function to patch the previous run's mesh around the pillars that changed since
+    # Returns None when the previous mesh is unusable and a full re-mesh is needed
+    def remesh_incrementally(self, cache, border_vertices, holes, settings, max_area):
+        run = cache.load_run()
+        if run is None:
+            return None
 
-        # Remove triangles involving excess vertices
-        new_triangles = []
-        for triangle_indices in mesh['triangles']:
-            if not any(v in excess_vertices for v in triangle_indices):
-                new_triangles.append(triangle_indices)
+        previous_key, previous_settings, previous_border, previous_holes = run
+        if previous_settings != settings or not np.array_equal(previous_border, border_vertices):
+            return None
+        if cache.output_key() != self.output_key(previous_key):
+            return None  # The output folders no longer hold the previous mesh and its files
 
-        mesh['triangles'] = np.array(new_triangles)
+        previous = cache.load(previous_key)
+        if previous is None:
+            return None
 
-        # Optionally, retriangulate locally to fill gaps (not shown here for simplicity)
-        return mesh
+        patched = remesh_changed_pillars(*previous, previous_holes, holes, max_area, self.pillar_index)
+        if patched is not None:
+            print(f"Re-meshed {len(patched['regions'])} regions around {len(diff_pillars(previous_holes, holes))} changed pillars")
+        return patched
 
-    def mesh_area(self, window, progress, label, stop_event, max_area, plot_func):
-        # Read the pillar (hole) vertices
-        holes = []
-        hole_segments = []
-        current_hole = []
-        current_segments = []
+    def mesh_area(self, max_area, stop_event=None, progress_callback=None, metrics_callback=None):
+        """Meshes the project and writes the element and plot files.
 
-        hole_files = []
-        hole_plot_files = []        
-        meshing_successful = False
+        progress_callback(message, fraction) is called from this thread with a
+        status message and the completed fraction (None while it is unknown).
+        metrics_callback(event) receives the stage events of RunMetrics.
+        Returns False if stop_event was set before all files were written.
+        Errors are raised to the caller.
+        """
+        data_dir = os.path.join(self.project_path, DATA_FOLDER_NAME)
+        self.stage_times = {}
+        self.metrics = RunMetrics(metrics_callback, self.trace_memory)
+        self.metrics.start(project=os.path.abspath(self.project_path), max_area=max_area, classification=self.classification_mode, tiles=self.tiles, naming=self.element_naming)
+        profiler = cProfile.Profile() if self.profile else None
+        status = "failed"
         try:
-            border_file = os.path.join(self.project_path, DATA_FOLDER_NAME, BORDER_VERTEX_FILE_NAME)
-            pillar_file = os.path.join(self.project_path, DATA_FOLDER_NAME, PILLAR_VERTEX_FILE_NAME)
+            if profiler is not None:
+                profiler.enable()
+            completed = self.run_stages(max_area, stop_event, progress_callback)
+            status = "completed" if completed else "cancelled"
+            return completed
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            summary = self.metrics.finish(status, pillars=self.pillars, triangles=self.triangles)
+
+            # Profiles are only kept for runs slow enough to be worth a look
+            if profiler is not None and summary['wall_time'] >= PROFILE_MIN_SECONDS:
+                os.makedirs(data_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(data_dir, PROFILE_FILE_NAME))
+            if self.run_log:
+                append_run_log(os.path.join(data_dir, RUN_LOG_FILE_NAME), summary)
+
+    def run_stages(self, max_area, stop_event=None, progress_callback=None):
+        """Runs every meshing stage for mesh_area, which measures the run."""
+        def report(message, fraction=None):
+            if progress_callback is not None:
+                progress_callback(message, fraction)
+
+        def cancelled():
+            return stop_event is not None and stop_event.is_set()
+
+        border_file = os.path.join(self.project_path, DATA_FOLDER_NAME, BORDER_VERTEX_FILE_NAME)
+        pillar_file = os.path.join(self.project_path, DATA_FOLDER_NAME, PILLAR_VERTEX_FILE_NAME)
 
-            # Read the border vertices
+        # Read the border and pillar (hole) vertices
+        report("Reading vertices...")
+        with self.stage("read"):
             border_vertices = self.read_vertices_from_file(border_file)
+            pillar_coords, pillar_offsets = read_pillar_file(pillar_file)
+            holes = split_polygons(pillar_coords, pillar_offsets)
+
+            # Bounding box index over the pillars, shared by classification and later queries
+            self.pillar_index = PolygonIndex(holes)
+
+            # Combine the border and all pillars into one PSLG with closed-loop segments
+            polygon = build_pslg(border_vertices, pillar_coords, pillar_offsets)
+
+            # Let triangle tag every output triangle with the pillar it lies in
+            switches = f"pqa{max_area}"
+            if self.classification_mode == CLASSIFY_BY_REGION and self.tiles <= 1:
+                polygon['regions'] = region_seeds(holes)
+                switches += "A"
+
+        # Reuse the triangulation of an identical earlier run when one is cached
+        # The stamp of the output folders is kept up to date even when caching is off
+        stamps = MeshCache(os.path.join(self.project_path, DATA_FOLDER_NAME, CACHE_FOLDER_NAME))
+        cache = stamps if self.use_cache else None
+        settings = f"{switches}|{self.classification_mode}|{MAX_EDGES_PER_VERTEX}"
+        if self.tiles > 1:
+            settings += f"|tiles{self.tiles}"
+        if self.element_naming != ELEMENT_NAMING_LEGACY:
+            settings += f"|{self.element_naming}"
+        cache_key = MeshCache.key(border_vertices, holes, settings)
+        cached = cache.load(cache_key) if cache is not None else None
+
+        # Patched meshes number and shape triangles unlike a fresh triangulation, so they
+        # are kept under their own key and only reused by incremental runs
+        patched_key = MeshCache.key(border_vertices, holes, settings, "incremental")
+        if cached is None and self.incremental and cache is not None:
+            cached = cache.load(patched_key)
+            if cached is not None:
+                cache_key = patched_key
+        self.pillars = len(holes)
+        patched = None
 
-            with open(pillar_file, 'r') as file:
-                lines = file.readlines()
-                for line in lines:
-                    if line.strip().startswith(PILLAR_OUTPUT_FILENAME_START):
-                        if current_hole:
-                            # Connect last segment to first for closed loop
-                            current_segments.append([len(current_hole) - 1, 0])
-
-                            holes.append(np.array(current_hole))
-                            hole_segments.append(np.array(current_segments))
-                            current_hole = []
-                            current_segments = []
-                    else:
-                        parts = line.strip().split()
-                        if len(parts) == 2:
-                            x, y = map(float, parts)
-                            current_hole.append([x, y])
-                            if len(current_hole) > 1:
-                                current_segments.append([len(current_hole) - 2, len(current_hole) - 1])
-                if current_hole:
-                    holes.append(np.array(current_hole))
-                    hole_segments.append(np.array(current_segments))
-
-            # Define segments for the border
-            num_border_vertices = len(border_vertices)
-            border_segments = np.array([[i, (i + 1) % num_border_vertices] for i in range(num_border_vertices)])
-
-            # Combine all vertices and segments
-            all_vertices = border_vertices.copy()
-            all_segments = border_segments.copy()
-            offset = len(border_vertices)
-
-            for hole, segments in zip(holes, hole_segments):
-                all_vertices = np.vstack([all_vertices, hole])
-                segments = segments + offset
-                all_segments = np.vstack([all_segments, segments])
-                offset += len(hole)
-
-            # Define the polygon dictionary
-            polygon = {
-                'vertices': all_vertices,
-                'segments': all_segments
-            }
+        # Fail on too many pillars before spending time on the mesh
+        naming = ElementNaming(self.element_naming)
+        naming.check_pillars(len(holes))
 
+        # Otherwise only re-mesh around the pillars edited since the last run when allowed
+        if cached is None and self.incremental and cache is not None:
+            report("Re-meshing changed pillars...")
+            with self.stage("triangulate"):
+                patched = self.remesh_incrementally(cache, border_vertices, holes, settings, max_area)
+            if cancelled():
+                return False
+
+        if cached is not None:
+            vertices, triangles, region_ids = cached
+            self.triangles = len(triangles)
+            report(f"Using cached mesh... ({self.triangles} triangles)", 0.0)
+        elif patched is not None:
+            vertices, triangles, region_ids = patched['vertices'], patched['triangles'], patched['region_ids']
+            self.triangles = len(triangles)
+            cache_key = patched_key
+            cache.store(cache_key, vertices, triangles, region_ids)
+        else:
             # Generate the mesh using the triangulate function with a max_area constraint
-            mesh = triangle.triangulate(polygon, f"pqa{max_area}")
-            mesh = self.enforce_edge_constraint(mesh)
-
-            # Create Data directory if it doesn't exist
-            mesh_dir = os.path.join(self.project_path, DATA_FOLDER_NAME, MESH_FOLDER_NAME)
-            plot_dir = os.path.join(self.project_path, DATA_FOLDER_NAME, PLOT_FOLDER_NAME)
-
-            if os.path.exists(mesh_dir):
-                with os.scandir(mesh_dir) as entries:
-                    for entry in entries:
-                        if entry.is_file():
-                            os.remove(entry.path)
-            else:
-                os.makedirs(mesh_dir)
+            report("Triangulating...")
+            with self.stage("triangulate") as record:
+                if self.tiles > 1:
+                    # Strips between pillar-free cut lines are triangulated in parallel and stitched
+                    mesh = triangulate_tiled(border_vertices, holes, max_area, self.tiles)
+                else:
+                    mesh = triangle.triangulate(polygon, switches)
+                mesh = self.enforce_edge_constraint(mesh, MAX_EDGES_PER_VERTEX)
+                record['triangles'] = len(mesh['triangles'])
+            if cancelled():
+                return False
 
-            if os.path.exists(plot_dir):
-                with os.scandir(plot_dir) as entries:
-                    for entry in entries:
-                        if entry.is_file():
-                            os.remove(entry.path)
-            else:
-                os.makedirs(plot_dir)
-
-            # Create text files for each hole
-            hole_files = [open(os.path.join(mesh_dir, f"{PILLAR_OUTPUT_FILENAME_START}{i+1}.{ELEMENT_FILE_EXT}"), "a") for i in range(len(holes))]
-            hole_plot_files = [open(os.path.join(plot_dir, f"{PILLAR_OUTPUT_FILENAME_START}{i+1}.{PLOT_FILE_EXT}"), "a") for i in range(len(holes))]
-            mined_file = open(os.path.join(mesh_dir, f"{MINED_OUTPUT_FILENAME_START}1.{ELEMENT_FILE_EXT}"), "a")
-            mined_plot_file = open(os.path.join(plot_dir, f"{MINED_OUTPUT_FILENAME_START}1.{PLOT_FILE_EXT}"), "a")
-            hole_counter = [1] * (len(holes) + 1)
-            m_counter = 1
-
-            # Identify and fill triangles inside each hole with transparent red color
-            i = 0
+            # Classify the triangles against the pillars a chunk at a time
             self.triangles = len(mesh['triangles'])
-            label["text"] = f"Meshing in progress... ({self.triangles} triangles)"
-            print("Triangles: " + str(self.triangles))
-            for triangle_indices in mesh['triangles']:
-                if stop_event.is_set():
-                    return
-
-                i += 1
-                # Get the triangle's vertices
-                triangle_points = mesh['vertices'][triangle_indices]
-                
-                # Calculate the centroid of the triangle
-                centroid = np.mean(triangle_points, axis=0)
-                
-                # Check if the centroid is inside any of the holes
-                inside_hole = False
-                for j, hole in enumerate(holes):
-                    if self.is_point_in_polygon(centroid, hole):
-                        inside_hole = True
-                        el_name = f"{(j + 1):02}" + f"{hole_counter[j]:05}"
-                        hole_counter[j] += 1
-                        hole_files[j].write(
-                            f"{PILLAR_TEXT.replace('XXXXXXX', el_name)}{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f} "
-                            f"{triangle_points[1][0]:.4f} {triangle_points[1][1]:.4f} "
-                            f"{triangle_points[2][0]:.4f} {triangle_points[2][1]:.4f}\n"
-                        )
-
-                        hole_plot_files[j].write(
-                            f"{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f}\n"
-                            f"{triangle_points[1][0]:.4f} {triangle_points[1][1]:.4f}\n"
-                            f"{triangle_points[2][0]:.4f} {triangle_points[2][1]:.4f}\n"
-                            f"{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f}\n\n"
-                        )
-
-                        break
-
-                if not inside_hole:
-                    el_name = "1" + f"{m_counter:06}"
-                    m_counter += 1
-                    mined_file.write(
-                        f"{MINED_TEXT.replace('XXXXXXX', el_name)}{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f} "
-                        f"{triangle_points[1][0]:.4f} {triangle_points[1][1]:.4f} "
-                        f"{triangle_points[2][0]:.4f} {triangle_points[2][1]:.4f}\n"
-                    )
-                
-                    mined_plot_file.write(
-                        f"{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f}\n"
-                        f"{triangle_points[1][0]:.4f} {triangle_points[1][1]:.4f}\n"
-                        f"{triangle_points[2][0]:.4f} {triangle_points[2][1]:.4f}\n"
-                        f"{triangle_points[0][0]:.4f} {triangle_points[0][1]:.4f}\n\n"
-                    )   
-
-                if(i % 100 == 0):
-                    # print(i, f"{i/self.triangles:.2%}")
-                    progress['value'] = (i/self.triangles)*100  # Update progress bar
-            
-            meshing_successful = True
-
-        except Exception as e:
-            print(e)
-            return
-        
-        finally:
-            window.destroy()
-            mined_file.close()
-            mined_plot_file.close()
-            for f in hole_files:
-                f.close()
-            for f in hole_plot_files:
-                f.close()  
-
-            # Plot the mesh
-            if meshing_successful:
-                plot_func()
-            
-            print("Exited the mesh generator and closed all files")
-        
\ No newline at end of file
+            message = f"Meshing in progress... ({self.triangles} triangles)"
+            report(message, 0.0)
+            with self.stage("classify") as record:
+                region_ids = self.classify_triangles(mesh, holes, self.pillar_index, stop_event, lambda fraction: report(message, fraction))
+                record['triangles'] = self.triangles
+            if region_ids is None or cancelled():
+                return False
+
+            vertices, triangles = mesh['vertices'], mesh['triangles']
+            if cache is not None:
+                cache.store(cache_key, vertices, triangles, region_ids)
+
+        # Element numbers per file are only known once classified, checked before anything is written
+        group_sizes = np.bincount(region_ids, minlength=len(holes) + 1)
+        naming.check(group_sizes)
+        mined_files = naming.mined_files(group_sizes[MINED_REGION_ID])
+
+        # Indexed copies of the mesh for other tools
+        if self.export_formats:
+            report("Exporting mesh...")
+            with self.stage("export") as record:
+                paths = export_mesh(os.path.join(self.project_path, DATA_FOLDER_NAME, EXPORT_FOLDER_NAME), self.export_formats, vertices, triangles, region_ids, len(holes))
+                record['bytes'] = sum(os.path.getsize(path) for path in paths)
+            if cancelled():
+                return False
+
+        # Create Data directory if it doesn't exist
+        mesh_dir = os.path.join(self.project_path, DATA_FOLDER_NAME, MESH_FOLDER_NAME)
+        plot_dir = os.path.join(self.project_path, DATA_FOLDER_NAME, PLOT_FOLDER_NAME)
+        writer = MeshWriter(mesh_dir, plot_dir, chunk_size=self.chunk_size, workers=self.output_workers, naming=naming)
+
+        # Nothing to do when the output folders already hold this exact mesh
+        if cache is not None and cache.output_key() == self.output_key(cache_key) and writer.outputs_exist(len(holes), mined_files):
+            report(f"Mesh files are up to date ({self.triangles} triangles)", 1.0)
+            return True
+
+        # Write the element and plot files for every pillar and the mined area
+        message = f"Writing files... ({self.triangles} triangles)"
+        with self.stage("write") as record:
+            stamps.set_output_key(None)
+
+            if patched is not None:
+                # Only the files touched by the patch are rewritten
+                writer.remove_outputs(patched['obsolete'])
+                completed = writer.write(vertices, triangles, region_ids, len(holes), stop_event, lambda fraction: report(message, fraction), patched['regions'], patched['resume'])
+            else:
+                writer.prepare_folders()
+                completed = writer.write(vertices, triangles, region_ids, len(holes), stop_event, lambda fraction: report(message, fraction))
+            record['bytes'] = writer.bytes_written
+            if not completed:
+                return False
+
+            # Binary copies of the element coordinates for the plotter and other tools
+            if self.write_sidecar:
+                writer.write_sidecars(vertices, triangles, region_ids, len(holes), patched['regions'] if patched is not None else None)
+
+            if cache is not None:
+                cache.set_output_key(self.output_key(cache_key))
+                cache.store_run(cache_key, border_vertices, holes, settings)
+            record['triangles'] = len(triangles)
+            record['bytes'] = writer.bytes_written
+        return True
+
+def print_progress(message, fraction):
+    """Progress callback for the command line, prints every new message and each 10% step."""
+    step = None if fraction is None else int(fraction * 10)
+    if (message, step) != getattr(print_progress, "last", None):
+        print_progress.last = (message, step)
+        print(message if step is None else f"{message} {step * 10}%", file=sys.stderr, flush=True)
+
+def print_metrics(event):
+    """Metrics callback for the command line, prints every finished stage."""
+    if event['event'] == 'stage_end':
+        print(format_stage(event['record']), file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mesher", description="Mesh a PolyMesh project without the GUI.")
+    parser.add_argument("project_dir", help=f"project folder containing {DATA_FOLDER_NAME}/{BORDER_VERTEX_FILE_NAME} and {DATA_FOLDER_NAME}/{PILLAR_VERTEX_FILE_NAME}")
+    parser.add_argument("--max-area", type=float, required=True, help="maximum triangle area")
+    parser.add_argument("--classification", choices=[CLASSIFY_BY_CENTROID, CLASSIFY_BY_REGION], default=CLASSIFICATION_MODE, help="how triangles are assigned to pillars")
+    parser.add_argument("--cross-check", action="store_true", help="compare region classification with the centroid test")
+    parser.add_argument("--workers", type=int, default=OUTPUT_WORKERS, help="output formatting workers (1 disables the pool)")
+    parser.add_argument("--no-cache", action="store_true", help=f"always triangulate, ignoring {DATA_FOLDER_NAME}/{CACHE_FOLDER_NAME}")
+    parser.add_argument("--incremental", action="store_true", help="only re-mesh around pillars changed since the last run")
+    parser.add_argument("--tiles", type=int, default=MESH_TILES, help="triangulate in up to this many strips on separate processes (1 meshes in one piece)")
+    parser.add_argument("--sidecar", action="store_true", help=f"also write a binary .{MESH_SIDECAR_EXT} copy of each element file, read by the plot")
+    parser.add_argument("--export", nargs="+", choices=EXPORT_FORMATS, default=[], help=f"also write the indexed mesh to {DATA_FOLDER_NAME}/{EXPORT_FOLDER_NAME} in these formats")
+    parser.add_argument("--naming", choices=ELEMENT_NAMINGS, default=ELEMENT_NAMING, help="element naming scheme, sharded and wide allow larger meshes than legacy")
+    parser.add_argument("--chunk-size", type=int, default=WRITE_CHUNK_SIZE, help="triangles classified and written per chunk")
+    parser.add_argument("--run-log", action="store_true", help=f"append the stage metrics of this run to {DATA_FOLDER_NAME}/{RUN_LOG_FILE_NAME}")
+    parser.add_argument("--profile", action="store_true", help=f"save a cProfile dump to {DATA_FOLDER_NAME}/{PROFILE_FILE_NAME} if the run takes {PROFILE_MIN_SECONDS:g} s or more")
+    parser.add_argument("--trace-memory", action="store_true", help="measure the peak memory of every stage with tracemalloc (slower)")
+    parser.add_argument("--quiet", action="store_true", help="do not print progress")
+    args = parser.parse_args(argv)
+
+    mesher = Mesher(args.project_dir, classification_mode=args.classification, cross_check=args.cross_check, output_workers=args.workers, use_cache=not args.no_cache, incremental=args.incremental, tiles=args.tiles, write_sidecar=args.sidecar or WRITE_MESH_SIDECAR, export_formats=args.export, element_naming=args.naming, run_log=args.run_log, profile=args.profile, trace_memory=args.trace_memory, chunk_size=args.chunk_size)
+    try:
+        mesher.mesh_area(args.max_area, progress_callback=None if args.quiet else print_progress, metrics_callback=None if args.quiet else print_metrics)
+    except Exception as e:
+        print(f"Meshing failed: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Meshed {args.project_dir}: {mesher.triangles} triangles")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
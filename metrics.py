@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Instrumentation of meshing runs: wall time, peak memory and throughput per stage
+
+def max_rss():
+    """Returns the peak resident memory of this process so far in bytes, or None where unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes
+
+def estimate_remaining(elapsed, fraction):
+    """Returns the seconds left when fraction of a task took elapsed seconds, or None before any progress."""
+    if not fraction or fraction <= 0:
+        return None
+    return elapsed * (1 - fraction) / fraction
+
+def format_stage(record):
+    """Returns a one line summary of a stage record."""
+    text = f"{record['stage']}: {record['wall_time']:.2f} s"
+    if record.get('triangles_per_second'):
+        text += f", {record['triangles_per_second']:,.0f} triangles/s"
+    if record.get('bytes_per_second'):
+        text += f", {record['bytes_per_second'] / 2**20:,.1f} MB/s"
+    if record.get('peak_memory') is not None:
+        text += f", peak {record['peak_memory'] / 2**20:,.1f} MB"
+    return text
+
+class RunMetrics:
+    """Wall time, peak memory and throughput of the stages of one meshing run.
+
+    Every stage is a dict with its wall time and its start in seconds since the run
+    started. When trace_memory is set, peak_memory holds the most memory traced by
+    tracemalloc while the stage ran; max_rss always holds the process peak where the
+    platform reports it. A stage can set 'triangles' and 'bytes' on its dict, which
+    become per-second rates when it ends. A stage that runs again adds to its totals.
+
+    callback(event) is called from the meshing thread with dicts whose 'event' is
+    'run_start', 'stage_start', 'stage_end' (with the stage dict) or 'run_end' (with
+    the summary).
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.info = {}
+        self.started = None
+        self.started_tracing = False
+
+    def emit(self, event, **values):
+        if self.callback is not None:
+            self.callback({'event': event, 'time': self.elapsed(), **values})
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started is not None else 0.0
+
+    def start(self, **info):
+        """Starts the run clock, and memory tracing when enabled. info is kept in the summary."""
+        self.stages = {}
+        self.info = info
+        self.started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.emit('run_start', **info)
+
+    @contextmanager
+    def stage(self, name):
+        """Measures the code in the with block as stage name and yields its dict."""
+        record = {'stage': name}
+        self.emit('stage_start', stage=name)
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['start'] = start - self.started if self.started is not None else 0.0
+            record['wall_time'] = time.perf_counter() - start
+            if self.trace_memory and tracemalloc.is_tracing():
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            record['max_rss'] = max_rss()
+            record = self.merge(record)
+            self.emit('stage_end', stage=name, record=dict(record))
+
+    def merge(self, record):
+        """Adds a finished stage to the totals of earlier runs of the same stage and returns the totals."""
+        total = self.stages.get(record['stage'])
+        if total is None:
+            total = self.stages[record['stage']] = record
+        else:
+            total['wall_time'] += record['wall_time']
+            for key in ('triangles', 'bytes'):
+                if key in record:
+                    total[key] = total.get(key, 0) + record[key]
+            for key in ('peak_memory', 'max_rss'):
+                if record.get(key) is not None:
+                    total[key] = max(total.get(key) or 0, record[key])
+
+        if total['wall_time'] > 0:
+            for key in ('triangles', 'bytes'):
+                if key in total:
+                    total[f"{key}_per_second"] = total[key] / total['wall_time']
+        return total
+
+    def finish(self, status, **info):
+        """Stops the run clock and memory tracing, and returns the run summary."""
+        summary = self.summary(status, **info)
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.emit('run_end', summary=summary)
+        return summary
+
+    def summary(self, status=None, **info):
+        return {
+            **self.info,
+            **info,
+            'status': status,
+            'finished': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'wall_time': self.elapsed(),
+            'max_rss': max_rss(),
+            'stages': list(self.stages.values()),
+        }
+
+def append_run_log(path, summary):
+    """Appends a run summary to a JSON lines log, one run per line."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(summary) + "\n")
@@ -0,0 +1,62 @@
+import threading
+
+class PreviewWorker:
+    """Runs a render function on a background thread, always on the newest request.
+
+    submit() replaces any request the thread has not started yet, so a burst of
+    slider or resize events renders only the last one. The finished result is kept
+    until the Tk thread collects it with take_result(); an older result that was
+    never collected is overwritten by a newer one.
+    """
+
+    def __init__(self, render_function):
+        self.render_function = render_function
+        self.condition = threading.Condition()
+        self.request = None
+        self.result = None
+        self.busy = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, request):
+        with self.condition:
+            self.request = request
+            self.condition.notify()
+
+    def pending(self):
+        """True while a request is queued, being rendered or waiting to be collected."""
+        with self.condition:
+            return self.request is not None or self.busy or self.result is not None
+
+    def take_result(self):
+        """Returns the newest finished result and clears it, or None."""
+        with self.condition:
+            result, self.result = self.result, None
+            return result
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                request, self.request = self.request, None
+                self.busy = True
+
+            try:
+                result = self.render_function(request)
+            except Exception as e:
+                print(f"Preview failed: {e}")
+                result = None
+
+            with self.condition:
+                self.busy = False
+                if result is not None:
+                    self.result = result
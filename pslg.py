@@ -0,0 +1,74 @@
+import numpy as np
+from constants import *
+
+# Reading of the border and pillar vertex files and assembly of the planar straight line
+# graph (PSLG) triangle meshes. Polygons are kept as one flat (n, 2) coordinate array
+# plus offsets, polygon i being coords[offsets[i]:offsets[i + 1]].
+
+def read_lines(filename):
+    # Split on "\n" only, like readlines() after universal newline translation
+    with open(filename, 'r') as file:
+        return file.read().split("\n")
+
+def parse_coordinates(tokens):
+    """Converts a list of [x, y] string pairs to an (n, 2) float array in one call."""
+    return np.array(tokens, dtype=np.float64).reshape(-1, 2)
+
+def read_border_file(filename):
+    """Returns the border vertices of a border.dat file as an (n, 2) array.
+
+    Every line of exactly two numbers is a vertex. Polygon header lines (starting
+    with M or P) and any other lines are ignored, so all polygons of the file are
+    read as one border. An empty file gives an empty array.
+    """
+    lines = [line.strip() for line in read_lines(filename)]
+    tokens = [line.split() for line in lines if not line.startswith((MINED_OUTPUT_FILENAME_START, PILLAR_OUTPUT_FILENAME_START))]
+    pairs = [pair for pair in tokens if len(pair) == 2]
+    if not pairs:
+        return np.array([])
+    return parse_coordinates(pairs)
+
+def read_pillar_file(filename):
+    """Returns the pillars of a pillars.dat file as flat (n, 2) coords and offsets.
+
+    Each line starting with P ends the current pillar, every other line of exactly
+    two numbers adds a vertex to it. Pillars without vertices are skipped.
+    """
+    lines = [line.strip() for line in read_lines(filename)]
+    header = np.array([line.startswith(PILLAR_OUTPUT_FILENAME_START) for line in lines], dtype=bool)
+    tokens = [line.split() for line in lines]
+    is_vertex = np.array([len(pair) == 2 for pair in tokens], dtype=bool) & ~header
+
+    # Vertices between two headers share a pillar number, empty pillars get no offset
+    pillar = np.cumsum(header)[is_vertex]
+    coords = parse_coordinates([pair for pair, vertex in zip(tokens, is_vertex) if vertex])
+    counts = np.unique(pillar, return_counts=True)[1]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return coords, offsets
+
+def split_polygons(coords, offsets):
+    """Returns the polygons of flat coords and offsets as a list of (n, 2) views."""
+    return [coords[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+def closed_loop_segments(offsets):
+    """Returns the (n, 2) segments joining every polygon's vertices in order and its last vertex back to the first."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    starts = np.arange(offsets[-1])
+    ends = starts + 1
+    counts = np.diff(offsets)
+    ends[offsets[1:][counts > 0] - 1] = offsets[:-1][counts > 0]
+    return np.column_stack([starts, ends])
+
+def build_pslg(border, pillar_coords, pillar_offsets):
+    """Returns the triangle input dict of the border followed by every pillar, each a closed loop."""
+    border = np.reshape(border, (-1, 2))
+    num_border = len(border)
+    vertices = np.empty((num_border + len(pillar_coords), 2), dtype=np.float64)
+    vertices[:num_border] = border
+    vertices[num_border:] = pillar_coords
+
+    offsets = np.concatenate([[0], num_border + np.asarray(pillar_offsets, dtype=np.int64)])
+    return {
+        'vertices': vertices,
+        'segments': closed_loop_segments(offsets)
+    }
@@ -0,0 +1,121 @@
+import numpy as np
+
+class PolygonIndex:
+    """Uniform grid over polygon bounding boxes.
+
+    Built once from a list of (n, 2) vertex arrays, for example the pillars parsed
+    from pillars.dat, and answers batched "which polygons could contain these
+    points" queries. The polygons are also kept packed as one flat vertex array
+    plus offsets so callers can run exact tests on the candidates only.
+    """
+
+    def __init__(self, polygons, cell_size=None):
+        polygons = [np.asarray(polygon, dtype=float).reshape(-1, 2) for polygon in polygons]
+        sizes = np.array([len(polygon) for polygon in polygons], dtype=np.int64)
+
+        self.offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.vertices = np.concatenate(polygons) if polygons else np.empty((0, 2))
+
+        # Bounding boxes as (xmin, ymin, xmax, ymax)
+        self.bounds = np.full((len(polygons), 4), np.nan)
+        filled = sizes > 0
+        if filled.any():
+            starts = self.offsets[:-1][filled]
+            self.bounds[filled, :2] = np.minimum.reduceat(self.vertices, starts)
+            self.bounds[filled, 2:] = np.maximum.reduceat(self.vertices, starts)
+
+        self._build_grid(filled, cell_size)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def _build_grid(self, filled, cell_size):
+        self._indexed = np.flatnonzero(filled)
+        if len(self._indexed) == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0
+            self.shape = (1, 1)
+            self._cell_start = np.zeros(2, dtype=np.int64)
+            self._cell_items = np.empty(0, dtype=np.int64)
+            return
+
+        bounds = self.bounds[self._indexed]
+        self.origin = bounds[:, :2].min(axis=0)
+        extent = np.maximum(bounds[:, 2:].max(axis=0) - self.origin, np.finfo(float).tiny)
+
+        # Cells about the size of a typical polygon keep both lists and candidates short
+        if cell_size is None:
+            cell_size = np.median(np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]))
+            if cell_size <= 0:
+                cell_size = extent.max() / np.sqrt(len(bounds))
+        max_cells = max(1024, 4 * len(bounds))
+        cells = np.prod(np.floor(extent / cell_size) + 1)
+        if cells > max_cells:
+            cell_size *= np.sqrt(cells / max_cells)
+        self.cell_size = float(cell_size)
+        nx, ny = (np.floor(extent / self.cell_size) + 1).astype(np.int64)
+        self.shape = (int(nx), int(ny))
+
+        # Register every polygon in each cell its bounding box overlaps (CSR layout)
+        lo = self._cell_coords(bounds[:, :2])
+        hi = self._cell_coords(bounds[:, 2:])
+        spans = hi - lo + 1
+        counts = spans[:, 0] * spans[:, 1]
+        items = np.repeat(self._indexed, counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        span_x = np.repeat(spans[:, 0], counts)
+        cell_x = np.repeat(lo[:, 0], counts) + local % span_x
+        cell_y = np.repeat(lo[:, 1], counts) + local // span_x
+        cell_ids = cell_y * nx + cell_x
+
+        order = np.argsort(cell_ids, kind="stable")
+        self._cell_items = items[order]
+        self._cell_start = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=nx * ny), out=self._cell_start[1:])
+
+    def _cell_coords(self, points):
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, np.array(self.shape) - 1)
+
+    def candidates(self, points):
+        """Returns (point ids, polygon ids) for every point inside a polygon's bounding box.
+
+        Pairs are sorted by point id and then by polygon id.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0 or len(self._cell_items) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        point_ids = np.arange(len(points))
+        cell_ids = self._cell_coords(points) @ np.array([1, self.shape[0]])
+        starts = self._cell_start[cell_ids]
+        counts = self._cell_start[cell_ids + 1] - starts
+
+        # Expand each point into one pair per polygon registered in its cell
+        pair_points = np.repeat(point_ids, counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_polygons = self._cell_items[np.repeat(starts, counts) + local]
+
+        bounds = self.bounds[pair_polygons]
+        x = points[pair_points, 0]
+        y = points[pair_points, 1]
+        hit = (x >= bounds[:, 0]) & (x <= bounds[:, 2]) & (y >= bounds[:, 1]) & (y <= bounds[:, 3])
+        pair_points = pair_points[hit]
+        pair_polygons = pair_polygons[hit]
+
+        order = np.lexsort((pair_polygons, pair_points))
+        return pair_points[order], pair_polygons[order]
+
+    def candidates_at(self, x, y):
+        """Returns the ids of the polygons whose bounding box contains a single point."""
+        return self.candidates([[x, y]])[1]
+
+    def candidates_in_box(self, xmin, ymin, xmax, ymax):
+        """Returns the ids of the polygons whose bounding box overlaps the given box."""
+        overlap = (self.bounds[:, 0] <= xmax) & (self.bounds[:, 2] >= xmin) & (self.bounds[:, 1] <= ymax) & (self.bounds[:, 3] >= ymin)
+        return np.flatnonzero(overlap)
+
+    def polygon(self, polygon_id):
+        """Returns the vertices of one indexed polygon."""
+        return self.vertices[self.offsets[polygon_id]:self.offsets[polygon_id + 1]]
@@ -0,0 +1,172 @@
+import multiprocessing
+import numpy as np
+import triangle
+from concurrent.futures import ProcessPoolExecutor
+from incremental import densify_polygon, target_edge_length
+
+# Tiled meshing: the border domain is split into vertical strips along cut lines that do not
+# cross any pillar, each strip is triangulated in its own worker process and the strips are
+# stitched back together. Every segment is pre-split to the target edge length and triangle
+# runs with the Y switch, so the points along a cut line are exactly the same in both strips
+# and the stitched mesh is conforming.
+
+def vertical_intervals(polygon, x):
+    """Returns the sorted y values where the vertical line at x crosses the polygon's edges, with the edge ids."""
+    following = np.roll(polygon, -1, axis=0)
+    crossing = np.flatnonzero((polygon[:, 0] - x) * (following[:, 0] - x) < 0)
+    a = polygon[crossing]
+    b = following[crossing]
+    ys = a[:, 1] + (x - a[:, 0]) * (b[:, 1] - a[:, 1]) / (b[:, 0] - a[:, 0])
+    order = np.argsort(ys)
+    return ys[order], crossing[order]
+
+def choose_cuts(border, holes, tiles, margin):
+    """Returns up to tiles - 1 increasing x positions that split the border area evenly and miss every pillar."""
+    xmin, xmax = border[:, 0].min(), border[:, 0].max()
+    if tiles <= 1 or xmax <= xmin:
+        return []
+
+    # Cumulative border area along x from the inside length of sampled vertical lines
+    samples = xmin + (np.arange(1024) + 0.5) * (xmax - xmin) / 1024
+    lengths = []
+    for x in samples:
+        ys, _ = vertical_intervals(border, x)
+        lengths.append((ys[1::2] - ys[0:-1:2]).sum())
+    cumulative = np.cumsum(lengths)
+    targets = np.interp(np.arange(1, tiles) / tiles * cumulative[-1], cumulative, samples)
+
+    # Gaps between the x ranges of the pillars (widened by margin) where a cut is allowed
+    spans = sorted((hole[:, 0].min() - margin, hole[:, 0].max() + margin) for hole in holes if len(hole))
+    gaps = []
+    position = xmin
+    for low, high in spans:
+        if low > position:
+            gaps.append((position, low))
+        position = max(position, high)
+    if position < xmax:
+        gaps.append((position, xmax))
+    gaps = [(low, high) for low, high in gaps if high - low > 2 * margin]
+    if not gaps:
+        return []
+
+    # Snap every target into the nearest gap, away from border vertex x values
+    vertex_xs = set(border[:, 0].tolist())
+    cuts = []
+    for target in targets:
+        low, high = min(gaps, key=lambda gap: 0 if gap[0] <= target <= gap[1] else min(abs(target - gap[0]), abs(target - gap[1])))
+        cut = min(max(target, low + margin), high - margin)
+        while cut in vertex_xs:
+            cut = np.nextafter(cut, high)
+        if not cuts or cut > cuts[-1] + margin:
+            cuts.append(float(cut))
+    return cuts
+
+def split_points(start, end, spacing):
+    """Returns the points from start to end (both exact) no further than spacing apart."""
+    count = max(1, int(np.ceil(np.linalg.norm(end - start) / spacing)))
+    points = start + (end - start) * (np.arange(count + 1) / count)[:, None]
+    points[0] = start
+    points[-1] = end
+    return points
+
+def build_tile_pslgs(border, holes, cuts, spacing):
+    """Returns one PSLG dict per strip between consecutive cuts."""
+    border = np.asarray(border, dtype=float)
+    following = np.roll(border, -1, axis=0)
+    bounds = [-np.inf] + list(cuts) + [np.inf]
+
+    # Crossings of every cut with the border, shared by the strips on both sides of the cut
+    crossings = {}
+    cut_lines = []
+    for k, x in enumerate(cuts):
+        ys, edges = vertical_intervals(border, x)
+        for y, edge in zip(ys, edges):
+            crossings[(k, edge)] = np.array([x, y])
+        cut_lines.append([split_points(np.array([x, y0]), np.array([x, y1]), spacing) for y0, y1 in zip(ys[0::2], ys[1::2])])
+
+    pslgs = []
+    for tile in range(len(cuts) + 1):
+        low, high = bounds[tile], bounds[tile + 1]
+        lines = []
+
+        # Border edges clipped to the strip, ending exactly on the shared crossings
+        for edge, (a, b) in enumerate(zip(border, following)):
+            if max(a[0], b[0]) < low or min(a[0], b[0]) > high:
+                continue
+            points = [a, b]
+            if tile > 0 and (tile - 1, edge) in crossings:
+                points.append(crossings[(tile - 1, edge)])
+            if tile < len(cuts) and (tile, edge) in crossings:
+                points.append(crossings[(tile, edge)])
+
+            # Keep the points inside the strip in order along the edge
+            points = [point for point in points if low <= point[0] <= high]
+            direction = b - a
+            points.sort(key=lambda point: np.dot(point - a, direction))
+            for start, end in zip(points[:-1], points[1:]):
+                lines.append(split_points(start, end, spacing))
+
+        # Both cut lines of the strip
+        if tile > 0:
+            lines.extend(cut_lines[tile - 1])
+        if tile < len(cuts):
+            lines.extend(cut_lines[tile])
+
+        vertices = []
+        segments = []
+        offset = 0
+        for line in lines:
+            vertices.append(line)
+            segments.append(np.column_stack([np.arange(len(line) - 1), np.arange(1, len(line))]) + offset)
+            offset += len(line)
+
+        # Pillars lie entirely inside one strip because cuts never cross them
+        for hole in holes:
+            if len(hole) >= 3 and low <= hole[0, 0] <= high:
+                outline = densify_polygon(hole, spacing)
+                loop = np.arange(len(outline))
+                vertices.append(outline)
+                segments.append(np.column_stack([loop, np.roll(loop, -1)]) + offset)
+                offset += len(outline)
+
+        # Shared end points appear in several lines, merge the exact duplicates
+        vertices, inverse = np.unique(np.vstack(vertices), axis=0, return_inverse=True)
+        segments = inverse.reshape(-1)[np.vstack(segments)]
+        segments = segments[segments[:, 0] != segments[:, 1]]
+        pslgs.append({'vertices': vertices, 'segments': segments})
+
+    return pslgs
+
+def triangulate_tile(pslg, switches):
+    """Triangulates one strip. Module level so it can run in a worker process."""
+    mesh = triangle.triangulate(pslg, switches)
+    return mesh['vertices'], mesh['triangles'], mesh['segments']
+
+def stitch_tiles(tile_meshes):
+    """Merges strip meshes into one mesh, joining the identical vertices along the cut lines."""
+    vertices = np.vstack([vertices for vertices, _, _ in tile_meshes])
+    offsets = np.cumsum([0] + [len(vertices) for vertices, _, _ in tile_meshes])
+    triangles = np.vstack([triangles + offset for (_, triangles, _), offset in zip(tile_meshes, offsets)])
+    segments = np.vstack([segments + offset for (_, _, segments), offset in zip(tile_meshes, offsets)])
+
+    # Segments along the cut lines appear in both neighbouring strips, which is harmless
+    vertices, inverse = np.unique(vertices, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return {'vertices': vertices, 'triangles': inverse[triangles], 'segments': inverse[segments]}
+
+def triangulate_tiled(border, holes, max_area, tiles, workers=None):
+    """Triangulates the border domain with its pillars in up to `tiles` strips on a process pool.
+
+    Returns a mesh dict with 'vertices', 'triangles' and 'segments' like triangle.triangulate.
+    """
+    spacing = target_edge_length(max_area)
+    cuts = choose_cuts(np.asarray(border, dtype=float), holes, tiles, spacing)
+    pslgs = build_tile_pslgs(border, holes, cuts, spacing)
+    switches = f"pqa{max_area}Y"
+
+    if len(pslgs) == 1 or (workers is not None and workers <= 1):
+        return stitch_tiles([triangulate_tile(pslg, switches) for pslg in pslgs])
+
+    # Spawned like the output pool, the GUI runs this from a thread of a threaded process
+    with ProcessPoolExecutor(max_workers=workers or min(len(pslgs), 8), mp_context=multiprocessing.get_context("spawn")) as executor:
+        return stitch_tiles(list(executor.map(triangulate_tile, pslgs, [switches] * len(pslgs))))
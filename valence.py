@@ -0,0 +1,122 @@
+import numpy as np
+
+# Vertex valence (number of edges meeting at a vertex) of triangle meshes, and its
+# repair by edge flips. Everything works on whole edge arrays, one sort per pass,
+# with the valence counted once and updated by every flip.
+
+def edge_keys(a, b, num_vertices):
+    """Returns one int64 key per undirected edge (a, b), the same for (b, a)."""
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    return np.minimum(a, b) * num_vertices + np.maximum(a, b)
+
+def unique_edges(triangles, num_vertices):
+    """Returns the (m, 2) array of distinct edges of a triangle mesh, smaller vertex first."""
+    triangles = np.asarray(triangles, dtype=np.int64)
+    keys = np.sort(edge_keys(triangles, np.roll(triangles, -1, axis=1), num_vertices), axis=None)
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return np.column_stack([keys // num_vertices, keys % num_vertices])
+
+def vertex_valence(triangles, num_vertices):
+    """Returns the number of distinct edges meeting at every vertex."""
+    return np.bincount(unique_edges(triangles, num_vertices).ravel(), minlength=num_vertices)
+
+def orientation(p, q, r):
+    """Twice the signed area of the triangles (p, q, r), positive when counter-clockwise."""
+    return (q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0])
+
+def flip_candidates(vertices, triangles, valence, max_edges, fixed_keys, labels):
+    """Returns the edges whose flip lowers the valence of an overfull end point, as
+    (triangle 1, triangle 2, v, w, a, b, score) arrays.
+
+    Edge v-w is shared by triangle 1 (v, w, a) and triangle 2 (w, v, b). Flipping it to
+    a-b takes one edge from v and w and gives one to a and b, so it is only a candidate
+    when a and b stay within max_edges, the quad v, b, w, a is strictly convex, the edge
+    is not a constrained segment and both triangles carry the same label.
+    """
+    num_vertices = len(vertices)
+    num_triangles = len(triangles)
+
+    # Half-edge h is edge h // num_triangles of triangle h % num_triangles
+    starts = triangles.T.ravel()
+    ends = np.roll(triangles, -1, axis=1).T.ravel()
+    opposite = np.roll(triangles, -2, axis=1).T.ravel()
+    keys = edge_keys(starts, ends, num_vertices)
+
+    # Interior edges are the two half-edges with equal keys next to each other after sorting
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    pairs = np.flatnonzero(sorted_keys[:-1] == sorted_keys[1:])
+    first, second = order[pairs], order[pairs + 1]
+
+    v, w, a, b = starts[first], ends[first], opposite[first], opposite[second]
+    triangle1, triangle2 = first % num_triangles, second % num_triangles
+    over = valence > max_edges
+    keep = (over[v] | over[w]) & (valence[a] < max_edges) & (valence[b] < max_edges) & (a != b)
+    if fixed_keys is not None and len(fixed_keys):
+        keep &= ~np.isin(sorted_keys[pairs], fixed_keys)
+    if labels is not None:
+        keep &= labels[triangle1] == labels[triangle2]
+    triangle1, triangle2, v, w, a, b = triangle1[keep], triangle2[keep], v[keep], w[keep], a[keep], b[keep]
+
+    # The new diagonal must cross the old one inside the quad
+    pv, pw, pa, pb = vertices[v], vertices[w], vertices[a], vertices[b]
+    convex = (orientation(pv, pw, pa) * orientation(pv, pw, pb) < 0) & (orientation(pa, pb, pv) * orientation(pa, pb, pw) < 0)
+    triangle1, triangle2, v, w, a, b = triangle1[convex], triangle2[convex], v[convex], w[convex], a[convex], b[convex]
+
+    # Prefer flips that relieve two overfull vertices and load the emptiest ones
+    score = valence[a] + valence[b] - valence[v] - valence[w]
+    return triangle1, triangle2, v, w, a, b, score
+
+def independent_flips(v, w, a, b, score, num_vertices):
+    """Returns a mask of candidates that share no vertex with a better scored candidate.
+
+    Flips without a common vertex also share no triangle, so all of them can be applied
+    at once. The best candidate overall is always selected.
+    """
+    rank = np.empty(len(score), dtype=np.int64)
+    rank[np.argsort(score, kind="stable")] = np.arange(len(score))
+    corners = np.concatenate([v, w, a, b])
+    best = np.full(num_vertices, len(score), dtype=np.int64)
+    np.minimum.at(best, corners, np.tile(rank, 4))
+    return (best[v] == rank) & (best[w] == rank) & (best[a] == rank) & (best[b] == rank)
+
+def limit_valence(vertices, triangles, max_edges, segments=None, labels=None):
+    """Flips edges until no vertex has more than max_edges edges, where possible.
+
+    No triangle is removed or added, so the mesh keeps its area and boundaries, and
+    labels (one per triangle) stay aligned. Segment edges and edges between differently
+    labelled triangles are never flipped. Every pass applies a set of independent flips
+    to the whole mesh. Returns the new triangles and the number of vertices still over
+    max_edges.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    triangles = np.array(triangles)
+    num_vertices = len(vertices)
+    fixed_keys = None
+    if segments is not None and len(segments):
+        segments = np.asarray(segments)
+        fixed_keys = np.unique(edge_keys(segments[:, 0], segments[:, 1], num_vertices))
+    if labels is not None:
+        labels = np.asarray(labels).reshape(len(triangles), -1)[:, 0]
+
+    # Counted once, flips then move single edges between known vertices
+    valence = vertex_valence(triangles, num_vertices)
+    while True:
+        if not (valence > max_edges).any():
+            return triangles, 0
+
+        triangle1, triangle2, v, w, a, b, score = flip_candidates(vertices, triangles, valence, max_edges, fixed_keys, labels)
+        if len(score) == 0:
+            return triangles, int(np.count_nonzero(valence > max_edges))
+
+        chosen = independent_flips(v, w, a, b, score, num_vertices)
+        v, w, a, b = v[chosen], w[chosen], a[chosen], b[chosen]
+        triangles[triangle1[chosen]] = np.column_stack([a, v, b])
+        triangles[triangle2[chosen]] = np.column_stack([b, w, a])
+
+        # Chosen flips share no vertex, so every vertex appears at most once per array
+        valence[v] -= 1
+        valence[w] -= 1
+        valence[a] += 1
+        valence[b] += 1